@@ -1,10 +1,15 @@
 from dataclasses import dataclass
 from typing import Dict, Any, List
 import numpy as np
+import rootSolvers
+import instrumentation
 
 
 
 def von_mises_stress(d, V, M, T, Kt, Kts):
+    if instrumentation.ENABLED:
+        instrumentation.count("von_mises_stress", np.size(d))
+
     pi = np.pi
 
     J = (pi / 32) * d**4
@@ -23,29 +28,104 @@ def von_mises_stress(d, V, M, T, Kt, Kts):
     return sigma_vm
 
 def fos_calculation(V, M ,T, Sy, Kt, Kts ,d):
+        if instrumentation.ENABLED:
+            instrumentation.count("fos_calculation", np.size(d))
         sigma_vm = von_mises_stress(d, V, M, T, Kt, Kts)
         return Sy / sigma_vm 
 
-def solve_required_diameter(V, M, T, Sy, Kt, Kts, target_fos):
+def von_mises_stress_derivative(d, V, M, T, Kt, Kts):
+    """
+    d(sigma_vm)/dd for the solid section. Bending and torsion scale
+    with 1/d^3 and direct shear with 1/d^2.
+    """
+    pi = np.pi
 
-    # diamater will prolly be between these bounds
-    d_low = 0.1
-    d_high = 5.0
-    d_mid = 0
+    sigma_b = Kt * 32 * M / (pi * d**3)
+    tau_t = Kts * 16 * T / (pi * d**3)
+    tau_v = 16 * V / (3 * pi * d**2)
 
-    for _ in range(100):
-        d_mid = 0.5 * (d_low + d_high)
-        fos = fos_calculation(V, M, T, Sy,  Kt, Kts, d_mid)
+    tau_combined = tau_t + tau_v
+    sigma_vm = np.sqrt(sigma_b**2 + 3 * tau_combined**2)
 
-        # Runs until fos is withing a certain tolerance or 100 iterations
-        if abs(fos - target_fos) < 1e-5:
-            break
+    dsigma_b = -3 * sigma_b / d
+    dtau_combined = -(3 * tau_t + 2 * tau_v) / d
 
-        # binary search for the fos
-        if  fos > target_fos:
-            d_high = d_mid
-        else:
-            d_low = d_mid
+    return (sigma_b * dsigma_b + 3 * tau_combined * dtau_combined) / sigma_vm
 
-    return d_mid
+def fos_derivative(V, M, T, Sy, Kt, Kts, d):
+    sigma_vm = von_mises_stress(d, V, M, T, Kt, Kts)
+    dsigma_vm = von_mises_stress_derivative(d, V, M, T, Kt, Kts)
+    return -Sy * dsigma_vm / sigma_vm**2
 
+def cubic_diameter_guess(V, M, T, Sy, Kt, Kts, target_fos):
+    """
+    Closed-form diameter ignoring the direct shear term:
+    sigma_vm = 16 / (pi d^3) * sqrt(4 (Kt M)^2 + 3 (Kts T)^2)
+    """
+    moment = np.sqrt(4 * (Kt * M)**2 + 3 * (Kts * T)**2)
+    return np.cbrt(16 * target_fos * moment / (np.pi * Sy))
+
+def solve_required_diameter(V, M, T, Sy, Kt, Kts, target_fos,
+                            method="bisection", bounds=(0.1, 5.0),
+                            full_output=False):
+    """
+    Diameter where the FoS hits target_fos.
+
+    method is one of rootSolvers.SOLVER_METHODS. Raises ValueError if
+    the answer is outside bounds. With full_output=True returns
+    (d, iterations).
+    """
+
+    # diamater will prolly be between these bounds
+    d_low, d_high = bounds
+
+    d_guess = None
+    if method == "cubic":
+        d_guess = cubic_diameter_guess(V, M, T, Sy, Kt, Kts, target_fos)
+
+    d, iterations = rootSolvers.solve_for_fos(
+        lambda d: fos_calculation(V, M, T, Sy, Kt, Kts, d),
+        lambda d: fos_derivative(V, M, T, Sy, Kt, Kts, d),
+        target_fos,
+        d_low, d_high,
+        method=method,
+        d_guess=d_guess
+    )
+
+    if full_output:
+        return d, iterations
+    return d
+
+def solve_required_diameter_batch(V, M, T, Sy, Kt, Kts, target_fos, d_guess=None):
+    """
+    Vectorized version of solve_required_diameter.
+
+    Inputs can be scalars or arrays of any (broadcastable) shape, so
+    thousands of load cases are solved in one call. Each case follows
+    the same bisection as the scalar path and stops updating once its
+    FoS is within tolerance, so the results match.
+
+    d_guess (same shape) warm-starts the bisection from a narrow bracket
+    around each guess; the answers then agree with the cold start to
+    within the FoS tolerance rather than exactly.
+    """
+
+    V, M, T, Sy, Kt, Kts, target_fos = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (V, M, T, Sy, Kt, Kts, target_fos))
+    )
+    shape = V.shape
+    n = V.size
+
+    if d_guess is not None:
+        d_guess = np.broadcast_to(np.asarray(d_guess, dtype=float), shape).ravel()
+
+    d = rootSolvers.bisection_batch(
+        lambda d, V, M, T, Sy, Kt, Kts: fos_calculation(V, M, T, Sy, Kt, Kts, d),
+        tuple(x.ravel() for x in (V, M, T, Sy, Kt, Kts)),
+        target_fos.ravel(),
+        np.full(n, 0.1),
+        np.full(n, 5.0),
+        d_guess=d_guess
+    )
+
+    return d.reshape(shape)
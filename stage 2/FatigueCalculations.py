@@ -0,0 +1,157 @@
+"""
+Fatigue design of the solid shaft sections (Shigley ch. 6-7).
+
+A rotating shaft sees the bending moment as fully reversed and the
+torque as steady, so by default M is the alternating moment and T the
+mean torque (split_loads). The direct shear V is left out, as is usual
+for fatigue.
+
+- endurance_limit: Se = ka kb kc kd ke Se' with the Marin factors for
+  surface finish, size and reliability (kc = kd = 1 for rotating
+  bending at room temperature).
+- notch_sensitivity: Neuber, q = 1 / (1 + sqrt(a) / sqrt(r)) with the
+  fillet radius r = r_ratio * d, the same convention as the static
+  solve. Kf = 1 + q (Kt - 1), Kfs = 1 + qs (Kts - 1).
+- fos_calculation: DE-Goodman or DE-ASME elliptic.
+
+Sut, Sy and stresses are in psi, lengths in inches. Everything works
+on numpy arrays.
+"""
+
+import numpy as np
+import rootSolvers
+
+CRITERIA = ("goodman", "asme_elliptic")
+
+# ka = a * Sut**b with Sut in kpsi
+SURFACE_FACTORS = {
+    "ground": (1.34, -0.085),
+    "machined": (2.70, -0.265),
+    "cold-drawn": (2.70, -0.265),
+    "hot-rolled": (14.4, -0.718),
+    "as-forged": (39.9, -0.995),
+}
+
+# ke by reliability
+RELIABILITY_FACTORS = {
+    0.50: 1.000,
+    0.90: 0.897,
+    0.95: 0.868,
+    0.99: 0.814,
+    0.999: 0.753,
+    0.9999: 0.702,
+}
+
+
+def split_loads(M, T):
+    """
+    (M_a, M_m, T_a, T_m) for a rotating shaft with steady loads.
+    """
+    zero = np.zeros_like(np.asarray(M, dtype=float))
+    return M, zero, zero, T
+
+
+def surface_factor(Sut, surface="machined"):
+    a, b = SURFACE_FACTORS[surface]
+    return a * (np.asarray(Sut) / 1000)**b
+
+
+def size_factor(d):
+    """
+    kb for rotating round sections, 0.11 in <= d <= 10 in
+    (1 below that range).
+    """
+    d = np.asarray(d, dtype=float)
+    return np.select(
+        [d < 0.11, d <= 2.0],
+        [1.0, 0.879 * d**-0.107],
+        0.91 * d**-0.157
+    )
+
+
+def endurance_limit(Sut, d, surface="machined", reliability=0.50):
+    """
+    Marin-corrected endurance limit. Se' = 0.5 Sut, capped at 100 kpsi.
+    """
+    Se_prime = np.minimum(0.5 * np.asarray(Sut, dtype=float), 100_000)
+    ke = RELIABILITY_FACTORS[reliability]
+    return surface_factor(Sut, surface) * size_factor(d) * ke * Se_prime
+
+
+def neuber_constant(Sut, loading="bending"):
+    """
+    sqrt(a) in sqrt(in), Sut in psi (fit for 50-250 kpsi steels).
+    """
+    S = np.asarray(Sut, dtype=float) / 1000
+    if loading == "bending":
+        return 0.246 - 3.08e-3 * S + 1.51e-5 * S**2 - 2.67e-8 * S**3
+    if loading == "torsion":
+        return 0.190 - 2.51e-3 * S + 1.35e-5 * S**2 - 2.67e-8 * S**3
+    raise ValueError("loading must be 'bending' or 'torsion'")
+
+
+def notch_sensitivity(r, Sut, loading="bending"):
+    return 1 / (1 + neuber_constant(Sut, loading) / np.sqrt(r))
+
+
+def fatigue_concentration(Kt, Kts, r, Sut):
+    """
+    (Kf, Kfs) from the static factors and the fillet radius r.
+    """
+    Kf = 1 + notch_sensitivity(r, Sut, "bending") * (Kt - 1)
+    Kfs = 1 + notch_sensitivity(r, Sut, "torsion") * (Kts - 1)
+    return Kf, Kfs
+
+
+def fos_calculation(M_a, M_m, T_a, T_m, Sut, Sy, Kt, Kts, r_ratio, d,
+                    criterion="goodman", surface="machined", reliability=0.50):
+    """
+    Fatigue FoS of a solid section of diameter d.
+    """
+    Kf, Kfs = fatigue_concentration(Kt, Kts, r_ratio * d, Sut)
+    Se = endurance_limit(Sut, d, surface, reliability)
+
+    # von Mises amplitudes, without the 16 / (pi d^3) section factor
+    A = np.sqrt(4 * (Kf * M_a)**2 + 3 * (Kfs * T_a)**2)
+    B = np.sqrt(4 * (Kf * M_m)**2 + 3 * (Kfs * T_m)**2)
+
+    section = 16 / (np.pi * d**3)
+
+    if criterion == "goodman":
+        return 1 / (section * (A / Se + B / Sut))
+    if criterion == "asme_elliptic":
+        return 1 / (section * np.sqrt((A / Se)**2 + (B / Sy)**2))
+    raise ValueError(f"criterion must be one of {CRITERIA}")
+
+
+def solve_required_diameter_batch(M_a, M_m, T_a, T_m, Sut, Sy, Kt, Kts, r_ratio,
+                                    target_fos, criterion="goodman",
+                                    surface="machined", reliability=0.50, d_guess=None):
+    """
+    Diameter where the fatigue FoS hits target_fos, for arrays of
+    cases (bisection on 0.1-5 in, like the static batch solver).
+    d_guess warm-starts the bisection as in the static solver.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of {CRITERIA}")
+
+    args = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float)
+            for x in (M_a, M_m, T_a, T_m, Sut, Sy, Kt, Kts, r_ratio, target_fos))
+    )
+    shape = args[0].shape
+    n = args[0].size
+    *params, target_fos = (x.ravel() for x in args)
+
+    def fos_func(d, M_a, M_m, T_a, T_m, Sut, Sy, Kt, Kts, r_ratio):
+        return fos_calculation(M_a, M_m, T_a, T_m, Sut, Sy, Kt, Kts, r_ratio, d,
+                                criterion, surface, reliability)
+
+    if d_guess is not None:
+        d_guess = np.broadcast_to(np.asarray(d_guess, dtype=float), shape).ravel()
+
+    d = rootSolvers.bisection_batch(
+        fos_func, tuple(params), target_fos,
+        np.full(n, 0.1), np.full(n, 5.0), d_guess=d_guess
+    )
+    return d.reshape(shape)
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import numpy as np
 
 # ----- DATA FROM NORTON (TORSION TABLE SHOWN) -----
@@ -24,32 +25,73 @@ bending_data = {
     1.01: [0.91938, -0.17032],
 }
 
-def interpolate_coefficients(D_over_d, data_dict):
-    ratios = np.array(list(data_dict.keys()))
+def compile_table(data_dict):
+    """
+    Turns a {D/d: [A, b]} table into sorted (ratios, A, b) arrays
+    ready for np.interp.
+    """
+    ratios = np.array(sorted(data_dict))
     A_vals = np.array([data_dict[k][0] for k in ratios])
     b_vals = np.array([data_dict[k][1] for k in ratios])
+    return ratios, A_vals, b_vals
 
-    A_interp = np.interp(D_over_d, ratios[::-1], A_vals[::-1])
-    b_interp = np.interp(D_over_d, ratios[::-1], b_vals[::-1])
+# compiled once at import instead of on every lookup
+TABLES = {
+    "torsion": compile_table(torsion_data),
+    "bending": compile_table(bending_data),
+}
+
+def interpolate_coefficients(D_over_d, table):
+    if isinstance(table, dict):
+        table = compile_table(table)
+
+    ratios, A_vals, b_vals = table
+
+    A_interp = np.interp(D_over_d, ratios, A_vals)
+    b_interp = np.interp(D_over_d, ratios, b_vals)
 
     return A_interp, b_interp
 
 def stress_concentration(D, d, r, mode="torsion"):
-    D_over_d = D / d
-    r_over_d = r / d
-
-    if mode == "torsion":
-        data = torsion_data
-    elif mode == "bending":
-        data = bending_data
-    else:
+    """
+    K = A (r/d)^b with A, b interpolated on D/d.
+    D, d and r can be scalars or arrays of the same shape.
+    """
+    D_over_d = np.divide(D, d)
+    r_over_d = np.divide(r, d)
+
+    if mode not in TABLES:
         raise ValueError("Mode must be 'torsion' or 'bending'")
 
-    A, b = interpolate_coefficients(D_over_d, data)
+    A, b = interpolate_coefficients(D_over_d, TABLES[mode])
 
     K = A * (r_over_d ** b)
     return K
 
+# ----- CACHED SCALAR LOOKUP -----
+# Ratios are rounded to CACHE_DECIMALS before lookup so repeated
+# optimizer passes over the same geometry hit the cache.
+CACHE_DECIMALS = 9
+CACHE_SIZE = 4096
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_coefficient(D_over_d, r_over_d, mode):
+    A, b = interpolate_coefficients(D_over_d, TABLES[mode])
+    return float(A * (r_over_d ** b))
+
+def cached_stress_concentration(D, d, r, mode="torsion"):
+    """
+    Scalar stress_concentration with a bounded LRU cache keyed on the
+    rounded (D/d, r/d).
+    """
+    if mode not in TABLES:
+        raise ValueError("Mode must be 'torsion' or 'bending'")
+
+    D_over_d = round(D / d, CACHE_DECIMALS)
+    r_over_d = round(r / d, CACHE_DECIMALS)
+
+    return _cached_coefficient(D_over_d, r_over_d, mode)
+
 # -------- Example --------
 D = 1.25
 d = 0.75
@@ -0,0 +1,209 @@
+"""
+Batch shaft design.
+
+design_shafts runs the same pipeline as main.design_shaft (shaft
+diameters, snap ring, gear key) for many shaft variants in one call and
+returns a numpy record array instead of printing a report.
+
+Every variant uses the default shaft layout (shaftLayout.default_layout)
+with its first keyway and snap ring; the input gives its loads. All
+variants are solved together as one tiled ShaftState, so the work is a
+handful of array calls rather than a Python loop per shaft.
+"""
+
+import os
+import numpy as np
+
+import main
+import DiameterCalculations
+import keywayCalculations
+import kernels
+import snapRingCalculation
+import shaftLayout
+
+LAYOUT = shaftLayout.default_layout()
+TEMPLATE = LAYOUT.state
+SEGMENT_NAMES = list(TEMPLATE.names)
+
+N_SEG = len(SEGMENT_NAMES)
+
+RESULT_DTYPE = np.dtype([
+    ("d", float, (N_SEG,)),
+    ("Kt", float, (N_SEG,)),
+    ("Kts", float, (N_SEG,)),
+    ("fos", float, (N_SEG,)),
+    ("snap_ring_d", float),
+    ("snap_ring_fos", float),
+    ("min_fos", float),
+    ("key_target_fos", float),
+    ("key_L", float),
+    ("key_w", float),
+    ("key_H", float),
+    ("key_fos", float),
+])
+
+
+def _has(batch, name):
+    names = batch.dtype.names if hasattr(batch, "dtype") else batch.keys()
+    return name in names
+
+
+def _column(batch, name, n, default):
+    """
+    Per-shaft column, broadcast to shape (n,) or (n, N_SEG).
+    """
+    if _has(batch, name):
+        return np.asarray(batch[name], dtype=float)
+    return np.full(n, default, dtype=float)
+
+
+def batch_state(batch):
+    """
+    Tiled ShaftState for the batch. batch["V"], ["M"], ["T"] have shape
+    (n_shafts, N_SEG) in SEGMENT_NAMES order; an optional "r_ratio"
+    column (per shaft or per segment) sets the fillet ratios.
+    """
+    V = np.asarray(batch["V"], dtype=float)
+    n = V.shape[0]
+
+    if V.shape != (n, N_SEG):
+        raise ValueError(f"Loads must have shape (n_shafts, {N_SEG}) "
+                            f"in the order {SEGMENT_NAMES}.")
+
+    state = TEMPLATE.tile(n)
+    state.V = V.ravel()
+    state.M = np.asarray(batch["M"], dtype=float).ravel()
+    state.T = np.asarray(batch["T"], dtype=float).ravel()
+
+    if _has(batch, "r_ratio"):
+        r_ratio = np.asarray(batch["r_ratio"], dtype=float)
+        if r_ratio.ndim == 1:
+            r_ratio = np.repeat(r_ratio[:, None], N_SEG, axis=1)
+        state.r_ratio = r_ratio.ravel().copy()
+
+    return state
+
+
+def design_shafts(batch, Sy=None, target_fos=None, Sy_key=None,
+                    fos_key_diff=main.FOS_KEY_DIFF):
+    """
+    Designs every shaft in the batch.
+
+    batch is a structured array or a dict of columns with "V", "M",
+    "T" of shape (n_shafts, N_SEG), and optionally per-shaft "Sy",
+    "target_fos", "Sy_key" and "r_ratio". Columns that are missing fall
+    back to the keyword arguments, then to the first entries of
+    main.MATERIALS / TARGET_FOS_LIST / KEY_MATERIALS.
+
+    Returns a record array with RESULT_DTYPE, one record per shaft.
+    Keys that do not fit come back as nan.
+    """
+    state = batch_state(batch)
+    n = state.V.size // N_SEG
+
+    Sy = _column(batch, "Sy", n, main.MATERIALS[0].Sy_psi if Sy is None else Sy)
+    target_fos = _column(batch, "target_fos", n,
+                            main.TARGET_FOS_LIST[0] if target_fos is None else target_fos)
+    Sy_key = _column(batch, "Sy_key", n,
+                        main.KEY_MATERIALS[0].Sy_psi if Sy_key is None else Sy_key)
+
+    Sy_seg = np.repeat(Sy, N_SEG)
+    fos_seg = np.repeat(target_fos, N_SEG)
+
+    # --- shaft ---
+    kernels.solve_discrete(state, Sy_seg, fos_seg, tol=main.TOL,
+                            max_outer_iter=main.MAX_ITER)
+
+    state.fos = DiameterCalculations.fos_calculation(
+        state.V, state.M, state.T, Sy_seg, state.Kt, state.Kts, state.d
+    )
+
+    def per_shaft(values):
+        return values.reshape(n, N_SEG)
+
+    gear = LAYOUT.keyways[0]
+    snap = LAYOUT.snap_rings[0]
+    seat = LAYOUT.snap_ring_seats[0]
+
+    d = per_shaft(state.d)
+    gear_d = d[:, gear]
+
+    # --- snap ring ---
+    snap_ring_d, snap_ring_fos = snapRingCalculation.solve_discrete_snap_ring_batch(
+        per_shaft(state.V)[:, snap],
+        per_shaft(state.M)[:, snap],
+        per_shaft(state.T)[:, snap],
+        Sy,
+        per_shaft(state.Kt)[:, snap],
+        per_shaft(state.Kts)[:, snap],
+        target_fos,
+        d[:, seat]
+    )
+
+    min_fos = np.minimum(per_shaft(state.fos).min(axis=1), snap_ring_fos)
+    key_target_fos = min_fos - fos_key_diff
+
+    # --- key ---
+    key_L, key_w, key_H, key_fos = keywayCalculations.discrete_key_design_batch(
+        per_shaft(state.T)[:, gear], gear_d, Sy_key, key_target_fos,
+        main.KEY_BOUNDS_L, main.KEY_BOUNDS_W, main.KEY_BOUNDS_H
+    )
+
+    results = np.empty(n, dtype=RESULT_DTYPE).view(np.recarray)
+    results.d = d
+    results.Kt = per_shaft(state.Kt)
+    results.Kts = per_shaft(state.Kts)
+    results.fos = per_shaft(state.fos)
+    results.snap_ring_d = snap_ring_d
+    results.snap_ring_fos = snap_ring_fos
+    results.min_fos = min_fos
+    results.key_target_fos = key_target_fos
+    results.key_L = key_L
+    results.key_w = key_w
+    results.key_H = key_H
+    results.key_fos = key_fos
+
+    return results
+
+
+def flat_columns(results):
+    """
+    Dict of 1-D columns, per-segment fields split as "d[<segment>]".
+    """
+    columns = {}
+    for name in results.dtype.names:
+        values = results[name]
+        if values.ndim == 1:
+            columns[name] = values
+        else:
+            for i, seg in enumerate(SEGMENT_NAMES):
+                columns[f"{name}[{seg}]"] = values[:, i]
+    return columns
+
+
+def save_results(results, path):
+    """
+    Writes results in one bulk call: .npz (numpy) or .parquet (needs
+    pyarrow).
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".npz":
+        np.savez(path, results=np.asarray(results), segment_names=SEGMENT_NAMES)
+    elif ext == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as err:
+            raise ImportError("Writing Parquet needs pyarrow (pip install pyarrow).") from err
+        pq.write_table(pa.table(flat_columns(results)), path)
+    else:
+        raise ValueError("Results path must end in .npz or .parquet")
+
+
+def load_results(path):
+    """
+    Reads results saved as .npz back into a record array.
+    """
+    with np.load(path) as data:
+        return data["results"].view(np.recarray)
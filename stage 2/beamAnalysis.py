@@ -0,0 +1,380 @@
+"""
+Shear / moment analysis of the shaft as a beam, ported from the Stage 1
+MATLAB script (beamPlotsEngFixed.m).
+
+Same Macaulay-function formulation: reactions from statics for one
+support (cantilever) or two (simply supported / overhanging), then
+shear and moment summed over supports, point loads, UDLs and applied
+moments on a linspace grid. The Y and Z planes are solved separately
+and combined into resultant shear and moment like ResultantGraphs.m.
+
+Load magnitudes can be numpy arrays (one entry per load case), in which
+case every output gets a leading load-case axis, so thousands of load
+scenarios with the same load positions run in one call.
+
+Units follow the Stage 1 plots:
+- x, positions in inches
+- forces in lbf, UDLs in lbf/in, moments and torques in in-lbf
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Tuple
+import numpy as np
+
+N_POINTS = 15 * 10**4
+
+
+@dataclass
+class BeamLoads:
+    length: float
+    supports: List[float]
+    # (magnitude, location), - down
+    point_loads: List[Tuple[float, float]] = field(default_factory=list)
+    # (magnitude, start, end), - down
+    udls: List[Tuple[float, float, float]] = field(default_factory=list)
+    # (magnitude, location), + CCW
+    moments: List[Tuple[float, float]] = field(default_factory=list)
+
+
+# Stage 1 inputs (Project1Ygraphs.m / Project1Zgraphs.m)
+PROJECT1_Y = BeamLoads(
+    length=15,
+    supports=[0, 15],
+    point_loads=[(-20.714285714286, 2.25), (-240, 10.375), (110.714285714286, 12.75)],
+)
+
+PROJECT1_Z = BeamLoads(
+    length=15,
+    supports=[0, 15],
+    point_loads=[(167.381, 2.25), (-740, 10.375), (572.619, 12.75)],
+)
+
+
+def macaulay(x, a, n):
+    return np.where(x >= a, (x - a)**n, 0.0)
+
+
+def _magnitude(value):
+    # load-case values broadcast against the x axis (last axis)
+    return np.asarray(value, dtype=float)[..., None]
+
+
+def reactions(loads):
+    """
+    Support reactions from statics.
+    Returns (R1, R2, M_wall); R2 is 0 for a cantilever and M_wall is 0
+    for two supports.
+    """
+    supports = sorted(loads.supports)
+    x1 = supports[0]
+
+    F_ext = (sum(np.asarray(P, dtype=float) for P, a in loads.point_loads)
+                + sum(np.asarray(w, dtype=float) * (b - a) for w, a, b in loads.udls))
+
+    M_loads_about_x1 = (
+        sum(np.asarray(P, dtype=float) * (a - x1) for P, a in loads.point_loads)
+        + sum(np.asarray(w, dtype=float) * (b - a) * ((a + b) / 2 - x1)
+                for w, a, b in loads.udls)
+        + sum(np.asarray(M, dtype=float) for M, a in loads.moments)
+    )
+
+    if len(supports) == 1:
+        return -F_ext, 0.0 * F_ext, -M_loads_about_x1
+
+    if len(supports) != 2:
+        raise ValueError("Beam needs 1 support (cantilever) or 2 supports.")
+
+    x2 = supports[1]
+    R2 = -M_loads_about_x1 / (x2 - x1)
+    R1 = -F_ext - R2
+    return R1, R2, 0.0 * F_ext
+
+
+def shear_moment(loads, x):
+    """
+    Shear and moment at the points x.
+    Returns (V, M), shape (..., len(x)) with a leading load-case axis
+    when the load magnitudes are arrays.
+    """
+    x = np.asarray(x, dtype=float)
+    supports = sorted(loads.supports)
+    R1, R2, M_wall = reactions(loads)
+
+    V = _magnitude(R1) * macaulay(x, supports[0], 0)
+    M = _magnitude(R1) * macaulay(x, supports[0], 1)
+
+    # A CCW couple steps the bending moment down. (The MATLAB script
+    # added couples with the opposite sign, which only mattered for
+    # cantilevers and applied moments; Stage 1 used neither.)
+    if len(supports) == 1:
+        M = M - _magnitude(M_wall) * macaulay(x, supports[0], 0)
+    else:
+        V = V + _magnitude(R2) * macaulay(x, supports[1], 0)
+        M = M + _magnitude(R2) * macaulay(x, supports[1], 1)
+
+    for P, a in loads.point_loads:
+        V = V + _magnitude(P) * macaulay(x, a, 0)
+        M = M + _magnitude(P) * macaulay(x, a, 1)
+
+    for w, a, b in loads.udls:
+        V = V + _magnitude(w) * (macaulay(x, a, 1) - macaulay(x, b, 1))
+        M = M + _magnitude(w) / 2 * (macaulay(x, a, 2) - macaulay(x, b, 2))
+
+    for M_app, a in loads.moments:
+        M = M - _magnitude(M_app) * macaulay(x, a, 0)
+
+    return V, M
+
+
+def torque(torques, x):
+    """
+    Shaft torque at the points x from applied torques [(T, location)].
+    Torque is carried from each input location onward (a Macaulay step,
+    like a point load in shear).
+    """
+    x = np.asarray(x, dtype=float)
+    T = np.zeros(x.shape)
+    for T_app, a in torques:
+        T = T + _magnitude(T_app) * macaulay(x, a, 0)
+    return T
+
+
+def resultant_diagrams(y_loads, z_loads, n_points=N_POINTS):
+    """
+    Resultant shear and moment of the two planes on a dense grid.
+    Both planes must have the same length.
+    Returns (x, V_res, M_res).
+    """
+    x = np.linspace(0, y_loads.length, n_points)
+
+    Vy, My = shear_moment(y_loads, x)
+    Vz, Mz = shear_moment(z_loads, x)
+
+    return x, np.hypot(Vy, Vz), np.hypot(My, Mz)
+
+
+def station_loads(y_loads, z_loads, torques, stations, eps=1e-9):
+    """
+    Critical resultant V, M and T at each station.
+
+    Shear (and torque, and moment under an applied couple) jumps at load
+    points, so each is evaluated just left and just right of the
+    station and the larger magnitude is kept.
+
+    stations: dict of name -> x location.
+    Returns dict of name -> (V, M, T); values are arrays when the load
+    magnitudes are arrays.
+    """
+    names = list(stations)
+    x = np.array([stations[name] for name in names], dtype=float)
+    sides = np.concatenate([x - eps, x + eps])
+
+    Vy, My = shear_moment(y_loads, sides)
+    Vz, Mz = shear_moment(z_loads, sides)
+    T = torque(torques, sides)
+
+    n = len(names)
+
+    def worst(values):
+        values = np.abs(values)
+        return np.maximum(values[..., :n], values[..., n:])
+
+    V_res = worst(np.hypot(Vy, Vz))
+    M_res = worst(np.hypot(My, Mz))
+    T_crit = worst(T)
+
+    return {
+        name: (V_res[..., i], M_res[..., i], T_crit[..., i])
+        for i, name in enumerate(names)
+    }
+
+
+# ----- EXACT CRITICAL SECTIONS -----
+# Between breakpoints (supports, load points, UDL ends, applied moments)
+# shear is linear and moment at most quadratic. The resultant shear is
+# then convex on each piece and peaks at a piece end; the resultant
+# moment peaks at a piece end or where d(My^2 + Mz^2)/dx = 0, a cubic
+# that only has interior roots on pieces under a UDL. Evaluating just
+# those points is exact and costs O(number of loads), not O(grid size).
+
+def breakpoints(*planes):
+    """
+    Sorted x locations where the shear / moment polynomials change.
+    """
+    length = planes[0].length
+    points = {0.0, float(length)}
+
+    for loads in planes:
+        points.update(loads.supports)
+        points.update(a for P, a in loads.point_loads)
+        points.update(a for w, a, b in loads.udls)
+        points.update(b for w, a, b in loads.udls)
+        points.update(a for M, a in loads.moments)
+
+    return np.array(sorted(p for p in points if 0 <= p <= length), dtype=float)
+
+
+def _quadratic(values):
+    """
+    Coefficients (c0, c1, c2) of c0 + c1 s + c2 s^2 through samples at
+    s = -1/4, 0, 1/4.
+    """
+    m1, m2, m3 = values
+    return m2, 2 * (m3 - m1), 8 * (m1 - 2 * m2 + m3)
+
+
+def _stationary_moment_points(y_loads, z_loads, x0, x1):
+    """
+    Interior points of the piece (x0, x1) where My^2 + Mz^2 can be
+    stationary, shape (..., 3) over the load cases. The cubic is solved
+    for every case at once through its companion matrix (what np.roots
+    does); roots that are complex or off the piece come back as the
+    piece midpoint, a harmless extra candidate.
+    """
+    x = x0 + (x1 - x0) * np.array([0.25, 0.5, 0.75])
+    _, My = shear_moment(y_loads, x)
+    _, Mz = shear_moment(z_loads, x)
+
+    a0, a1, a2 = _quadratic(np.moveaxis(My, -1, 0))
+    b0, b1, b2 = _quadratic(np.moveaxis(Mz, -1, 0))
+
+    c3 = 2 * (a2**2 + b2**2)
+    lower = (3 * (a1 * a2 + b1 * b2),
+                2 * (a0 * a2 + b0 * b2) + a1**2 + b1**2,
+                a0 * a1 + b0 * b1)
+
+    # without curvature in either plane (c3 = 0) the resultant is convex
+    # on the piece and peaks at an end, so those cases need no root
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monic = np.stack([c / c3 for c in lower], axis=-1)
+    monic[~np.isfinite(monic).all(axis=-1)] = 0.0
+
+    companion = np.zeros(monic.shape[:-1] + (3, 3))
+    companion[..., 0, :] = -monic
+    companion[..., 1, 0] = 1.0
+    companion[..., 2, 1] = 1.0
+
+    roots = np.linalg.eigvals(companion)
+    s = np.where((roots.imag == 0) & (np.abs(roots.real) < 0.5), roots.real, 0.0)
+
+    return x0 + (x1 - x0) * (s + 0.5)
+
+
+def critical_points(y_loads, z_loads, x0=0.0, x1=None, eps=1e-9):
+    """
+    Every x in [x0, x1] where the resultant shear or moment can peak:
+    just inside the span ends, both sides of each interior breakpoint,
+    and the stationary points of the resultant moment under UDLs.
+    Scalar load magnitudes only.
+    """
+    if x1 is None:
+        x1 = y_loads.length
+
+    bps = breakpoints(y_loads, z_loads)
+    inner = bps[(bps > x0) & (bps < x1)]
+
+    points = [np.array([x0 + eps, x1 - eps]), inner - eps, inner + eps]
+
+    if y_loads.udls or z_loads.udls:
+        edges = np.concatenate([[x0], inner, [x1]])
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            points.append(_stationary_moment_points(y_loads, z_loads, lo, hi))
+
+    return np.unique(np.concatenate(points))
+
+
+def _case_shape(y_loads, z_loads, torques):
+    shapes = [np.shape(value)
+                for loads in (y_loads, z_loads)
+                for value in [P for P, a in loads.point_loads]
+                + [w for w, a, b in loads.udls]
+                + [M for M, a in loads.moments]]
+    shapes += [np.shape(T) for T, a in torques]
+    return np.broadcast_shapes(*shapes) if shapes else ()
+
+
+def span_loads(y_loads, z_loads, torques, spans, eps=1e-9):
+    """
+    Exact worst resultant V, M and |T| over each span.
+
+    The breakpoints only depend on the load positions, so every load
+    case is evaluated at the same points in one call; only the moment
+    stationary points under UDLs differ per case.
+
+    spans: dict of name -> (x_start, x_end).
+    Returns dict of name -> (V, M, T), arrays over the load-case axis
+    when the load magnitudes are arrays.
+    """
+    shape = _case_shape(y_loads, z_loads, torques)
+    bps = np.union1d(breakpoints(y_loads, z_loads), [a for T, a in torques])
+
+    out = {}
+    for name, (x0, x1) in spans.items():
+        inner = bps[(bps > x0) & (bps < x1)]
+        x = np.concatenate([[x0 + eps, x1 - eps], inner - eps, inner + eps])
+
+        Vy, My = shear_moment(y_loads, x)
+        Vz, Mz = shear_moment(z_loads, x)
+
+        V = np.max(np.hypot(Vy, Vz), axis=-1)
+        M = np.max(np.hypot(My, Mz), axis=-1)
+        T = np.max(np.abs(torque(torques, x)), axis=-1)
+
+        if y_loads.udls or z_loads.udls:
+            edges = np.concatenate([[x0], inner, [x1]])
+            for lo, hi in zip(edges[:-1], edges[1:]):
+                xs = _stationary_moment_points(y_loads, z_loads, lo, hi)
+                _, My = shear_moment(y_loads, xs)
+                _, Mz = shear_moment(z_loads, xs)
+                M = np.maximum(M, np.max(np.hypot(My, Mz), axis=-1))
+
+        out[name] = tuple(np.broadcast_to(v, shape).copy() for v in (V, M, T))
+
+    return out
+
+
+def max_resultant(y_loads, z_loads, eps=1e-9):
+    """
+    Exact peak resultant shear and moment over the whole beam for one
+    load case. Returns (V_max, x_V, M_max, x_M).
+    """
+    x = critical_points(y_loads, z_loads, 0.0, y_loads.length, eps)
+
+    Vy, My = shear_moment(y_loads, x)
+    Vz, Mz = shear_moment(z_loads, x)
+    V_res, M_res = np.hypot(Vy, Vz), np.hypot(My, Mz)
+
+    i_V, i_M = np.argmax(V_res), np.argmax(M_res)
+    return float(V_res[i_V]), float(x[i_V]), float(M_res[i_M]), float(x[i_M])
+
+
+def iter_dense_diagrams(y_loads, z_loads, n_points=N_POINTS, chunk_size=10_000):
+    """
+    Lazily yields (x, V_res, M_res) chunks of the dense linspace grid,
+    for plotting without holding the whole grid in memory.
+    """
+    for start in range(0, n_points, chunk_size):
+        i = np.arange(start, min(start + chunk_size, n_points))
+        x = y_loads.length * i / (n_points - 1)
+
+        Vy, My = shear_moment(y_loads, x)
+        Vz, Mz = shear_moment(z_loads, x)
+
+        yield x, np.hypot(Vy, Vz), np.hypot(My, Mz)
+
+
+def apply_station_loads(segments, loads):
+    """
+    Copies station_loads output onto Segments with the same names.
+    Returns the segments.
+    """
+    for name, (V, M, T) in loads.items():
+        seg = segments[name]
+        seg.V, seg.M, seg.T = float(V), float(M), float(T)
+    return segments
+
+
+if __name__ == "__main__":
+    V_max, x_V, M_max, x_M = max_resultant(PROJECT1_Y, PROJECT1_Z)
+    print(f"Max resultant shear:  {V_max:.2f} lbf at x = {x_V:.3f} in")
+    print(f"Max resultant moment: {M_max:.2f} in-lbf at x = {x_M:.3f} in")
@@ -0,0 +1,435 @@
+"""
+Benchmark suite for the solvers.
+
+Each workload runs with instrumentation on, so alongside the wall time
+it reports the time per stage and the stress/FoS evaluations per second.
+The answers are summarized and compared to benchmark_reference.json, so
+a speedup that changes results shows up as a FAIL.
+
+Run from this folder:
+    python benchmarks.py                      # everything
+    python benchmarks.py --only radii_9 load  # workloads whose name starts with these
+    python benchmarks.py --update-reference   # re-record the reference answers
+    python benchmarks.py --json results.json  # also save the timings
+
+Workloads:
+    single_shaft       main.design_shaft, one material / design factor
+    batch_1k           batchDesign.design_shafts on 1000 shaft variants
+    load_cases_100k    shaft diameter, snap ring and key batch solvers
+                       on 100k random load cases
+    radii_9/50/200     main.optimize_radii with 9, 50 and 200 radius steps
+    radii_exhaustive   radiusSearch.branch_and_bound against exhaustive
+                       enumeration on a 4-ratio grid for a few Sy / FoS
+                       cases (the optimum must match)
+    hollow_1k          hollowShaft.design_hollow on 1000 shaft variants,
+                       stepped and through bores
+    pareto_9           paretoExplorer.explore with 9 radius steps
+    scalar_vs_batch_10k/1m
+                       scalar solve_required_diameter loop against the
+                       batch solver on 10k and 1M cases (scalar time
+                       scaled up from the first 10k, speedup and max
+                       difference)
+    kernel_vs_numpy    kernels.cross_check on 200 shaft variants, then
+                       one shaft per call through the NumPy solver and
+                       the kernel (per-shaft latency)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+import main
+import batchDesign
+import DiameterCalculations
+import snapRingCalculation
+import keywayCalculations
+import hollowShaft
+import paretoExplorer
+import radiusSearch
+import shaftLayout
+import kernels
+import shaftState
+import instrumentation
+
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "benchmark_reference.json")
+
+# relative tolerance of the reference check, the bisection's FoS
+# tolerance: snapped sizes are exact, but FoS and key values go through
+# Kt/Kts of the continuous diameters, which move with the bracket
+REFERENCE_RTOL = 1e-5
+
+SY = main.MATERIALS[0].Sy_psi
+TARGET_FOS = main.TARGET_FOS_LIST[0]
+SY_KEY = main.KEY_MATERIALS[0].Sy_psi
+
+# counters that are one stress evaluation per load case
+EVALUATION_COUNTERS = ("von_mises_stress", "snap_ring.von_mises_stress")
+
+
+def random_load_cases(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "V": rng.uniform(50, 700, n),
+        "M": rng.uniform(100, 1500, n),
+        "T": rng.uniform(-1000, 1000, n),
+        "Kt": rng.uniform(1.0, 2.5, n),
+        "Kts": rng.uniform(1.0, 2.0, n),
+    }
+
+
+def random_shaft_batch(n, seed=0):
+    """
+    n variants of the main.build_segments loads, each segment's V, M
+    and T scaled by a random factor in [0.5, 1.5].
+    """
+    rng = np.random.default_rng(seed)
+    template = batchDesign.TEMPLATE
+    shape = (n, batchDesign.N_SEG)
+    return {
+        "V": template.V * rng.uniform(0.5, 1.5, shape),
+        "M": template.M * rng.uniform(0.5, 1.5, shape),
+        "T": template.T * rng.uniform(0.5, 1.5, shape),
+    }
+
+
+def summarize(values):
+    """
+    [sum, sum of squares, min, max] of the finite values plus the nan
+    count: a few numbers that move if any answer moves.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    finite = values[np.isfinite(values)]
+    return [float(finite.sum()), float((finite**2).sum()),
+            float(finite.min()) if finite.size else 0.0,
+            float(finite.max()) if finite.size else 0.0,
+            int(values.size - finite.size)]
+
+
+# --- workloads: each returns {output name: summary} ---
+
+def bench_single_shaft():
+    design = main.design_shaft(SY, TARGET_FOS, SY_KEY, main.FOS_KEY_DIFF)
+    segments = design["segments"].values()
+    return {
+        "d": summarize([seg.d for seg in segments]),
+        "fos": summarize([seg.fos for seg in segments]),
+        "key": summarize(design["key"]),
+    }
+
+
+def bench_batch_1k():
+    results = batchDesign.design_shafts(random_shaft_batch(1000), SY, TARGET_FOS, SY_KEY)
+    return {
+        "d": summarize(results.d),
+        "fos": summarize(results.fos),
+        "snap_ring_d": summarize(results.snap_ring_d),
+        "key": summarize([results.key_L, results.key_w, results.key_H]),
+    }
+
+
+def bench_load_cases_100k():
+    cases = random_load_cases(100_000)
+
+    with instrumentation.stage("shaft"):
+        d = DiameterCalculations.solve_required_diameter_batch(
+            cases["V"], cases["M"], cases["T"],
+            SY, cases["Kt"], cases["Kts"], TARGET_FOS
+        )
+
+    with instrumentation.stage("snap_ring"):
+        snap_d, snap_fos = snapRingCalculation.solve_discrete_snap_ring_batch(
+            cases["V"], cases["M"], cases["T"],
+            SY, cases["Kt"], cases["Kts"], TARGET_FOS, d
+        )
+
+    with instrumentation.stage("key"):
+        key_L, key_w, key_H, key_fos = keywayCalculations.discrete_key_design_batch(
+            cases["T"], d, SY_KEY, TARGET_FOS - main.FOS_KEY_DIFF,
+            main.KEY_BOUNDS_L, main.KEY_BOUNDS_W, main.KEY_BOUNDS_H
+        )
+
+    return {
+        "d": summarize(d),
+        "snap_ring_d": summarize(snap_d),
+        "key": summarize([key_L, key_w, key_H]),
+    }
+
+
+def bench_radii(r_steps):
+    def run():
+        segments = main.optimize_radii(SY, TARGET_FOS, main.R_MIN, main.R_MAX,
+                                        r_steps)
+        segments = segments.values()
+        return {
+            "d": summarize([seg.d for seg in segments]),
+            "r_ratio": summarize([seg.r_ratio for seg in segments]),
+        }
+    return run
+
+
+# (Sy, target FoS) cases for radii_exhaustive
+EXHAUSTIVE_CASES = [(60200, 2.0), (60200, 3.0), (43000, 2.0), (43000, 1.5), (80000, 2.5)]
+
+
+def bench_radii_exhaustive(r_steps=4):
+    """
+    Checks the optimality of branch_and_bound, which assumes the snapped
+    total diameter never goes up with a fillet ratio, by enumerating
+    every combination on a small grid (all of them solved as one tiled
+    state).
+    """
+    state = shaftLayout.default_layout().state
+    n_seg = state.d.size
+    linked = np.flatnonzero(state.link >= 0)
+    r_values = np.linspace(main.R_MIN, main.R_MAX, r_steps)
+
+    mismatches = 0
+    totals = []
+    for Sy, target_fos in EXHAUSTIVE_CASES:
+        def total_diameter(radii):
+            trial = state.copy()
+            trial.r_ratio[linked] = radii
+            main.solve_shaft_discrete(trial, Sy, target_fos)
+            return trial.d.sum()
+
+        def total_diameters(combos):
+            trial = state.tile(len(combos))
+            trial.r_ratio.reshape(-1, n_seg)[:, linked] = combos
+            main.solve_shaft_discrete(trial, Sy, target_fos)
+            return trial.d.reshape(-1, n_seg).sum(axis=1)
+
+        with instrumentation.stage("branch_and_bound"):
+            combo, total, _ = radiusSearch.branch_and_bound(total_diameter, linked.size,
+                                                            r_values)
+        with instrumentation.stage("exhaustive"):
+            best_combo, best_total, _ = radiusSearch.exhaustive(total_diameters, linked.size,
+                                                                r_values)
+
+        mismatches += combo != best_combo or abs(total - best_total) > 1e-9
+        totals.append(best_total)
+
+    return {"mismatches": int(mismatches), "total_d": summarize(totals)}
+
+
+def bench_hollow_1k():
+    state = batchDesign.batch_state(random_shaft_batch(1000))
+    answers = {}
+    for bore in hollowShaft.BORE_MODES:
+        design = hollowShaft.design_hollow(state, SY, TARGET_FOS, bore=bore,
+                                            n_seg=batchDesign.N_SEG)
+        answers[bore + "_OD"] = summarize(design.OD)
+        answers[bore + "_ID"] = summarize(design.ID)
+        answers[bore + "_mass"] = summarize(design.mass)
+    return answers
+
+
+def bench_pareto_9():
+    front = paretoExplorer.explore(r_values=np.linspace(main.R_MIN, main.R_MAX, 9))
+    return {
+        "mass": summarize(front.mass),
+        "cost": summarize(front.cost),
+        "min_fos": summarize(front.min_fos),
+    }
+
+
+# the scalar loop only runs on this many cases and is scaled up
+SCALAR_LIMIT = 10_000
+
+# checked directly or timings, so not compared to the reference
+UNRECORDED_OUTPUTS = ("max_diff", "scalar_seconds_est", "speedup")
+
+
+def bench_scalar_vs_batch(n):
+    """
+    Times the scalar solver loop against the batch solver on n cases.
+    The scalar loop runs on the first SCALAR_LIMIT cases and its time is
+    scaled up to n; the answers are compared on those cases.
+    """
+    def run():
+        cases = random_load_cases(n)
+        args = (cases["V"], cases["M"], cases["T"], SY, cases["Kt"], cases["Kts"])
+
+        t0 = time.perf_counter()
+        with instrumentation.stage("batch"):
+            d_batch = DiameterCalculations.solve_required_diameter_batch(*args, TARGET_FOS)
+        t_batch = time.perf_counter() - t0
+
+        n_scalar = min(n, SCALAR_LIMIT)
+        t0 = time.perf_counter()
+        with instrumentation.stage("scalar"):
+            d_scalar = np.array([
+                DiameterCalculations.solve_required_diameter(
+                    cases["V"][i], cases["M"][i], cases["T"][i],
+                    SY, cases["Kt"][i], cases["Kts"][i], TARGET_FOS
+                )
+                for i in range(n_scalar)
+            ])
+        t_scalar = (time.perf_counter() - t0) * n / n_scalar
+
+        return {
+            "d": summarize(d_batch),
+            "max_diff": float(np.max(np.abs(d_scalar - d_batch[:n_scalar]))),
+            "scalar_seconds_est": t_scalar,
+            "speedup": t_scalar / t_batch,
+        }
+    return run
+
+
+def bench_kernel_vs_numpy(n=200):
+    """
+    Compares the kernels with the NumPy solvers (kernels.cross_check),
+    then times single-shaft solves through each path.
+    """
+    batch = random_shaft_batch(n)
+    offsets = np.arange(n) * batchDesign.N_SEG
+    check = kernels.cross_check(batchDesign.batch_state(batch), SY, TARGET_FOS,
+                                batchDesign.LAYOUT.snap_rings[0] + offsets,
+                                batchDesign.LAYOUT.snap_ring_seats[0] + offsets,
+                                tol=main.TOL, max_outer_iter=main.MAX_ITER)
+
+    shafts = [batchDesign.batch_state({c: batch[c][k:k + 1] for c in batch})
+                for k in range(n)]
+    # compile outside the timed stages
+    kernels.solve_discrete_kernel(shafts[0].copy(), SY, TARGET_FOS)
+
+    for label, solve in (("numpy", shaftState.solve_discrete),
+                            ("kernel", kernels.solve_discrete_kernel)):
+        with instrumentation.stage(label):
+            for shaft in shafts:
+                solve(shaft.copy(), SY, TARGET_FOS, main.TOL, main.MAX_ITER)
+
+    return {"ok": check.ok, "max_fos_diff": check.max_fos_diff}
+
+
+WORKLOADS = {
+    "single_shaft": bench_single_shaft,
+    "batch_1k": bench_batch_1k,
+    "load_cases_100k": bench_load_cases_100k,
+    "radii_9": bench_radii(9),
+    "radii_50": bench_radii(50),
+    "radii_200": bench_radii(200),
+    "radii_exhaustive": bench_radii_exhaustive,
+    "hollow_1k": bench_hollow_1k,
+    "pareto_9": bench_pareto_9,
+    "scalar_vs_batch_10k": bench_scalar_vs_batch(10_000),
+    "scalar_vs_batch_1m": bench_scalar_vs_batch(1_000_000),
+    "kernel_vs_numpy": bench_kernel_vs_numpy,
+}
+
+
+def run_workload(name, func, repeat=1):
+    """
+    Runs func repeat times (best time kept) with instrumentation on.
+    The solvers' progress prints are swallowed.
+    """
+    best = None
+    for _ in range(repeat):
+        with instrumentation.collect() as stats, \
+                contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            answers = func()
+            seconds = time.perf_counter() - t0
+
+        if best is None or seconds < best["seconds"]:
+            evaluations = sum(stats.counters[c] for c in EVALUATION_COUNTERS)
+            best = {
+                "name": name,
+                "seconds": seconds,
+                "evaluations": evaluations,
+                "evaluations_per_s": evaluations / seconds,
+                **stats.as_dict(),
+                "answers": answers,
+            }
+    return best
+
+
+def check_reference(result, reference):
+    """
+    "ok", "FAIL" or "new" (no reference recorded for this workload).
+    """
+    if result["name"].startswith("scalar_vs_batch") and result["answers"]["max_diff"] >= 1e-4:
+        return "FAIL"
+    if result["name"] == "kernel_vs_numpy":
+        return "ok" if result["answers"]["ok"] else "FAIL"
+    if result["name"] == "radii_exhaustive" and result["answers"]["mismatches"]:
+        return "FAIL"
+
+    expected = reference.get(result["name"])
+    if expected is None:
+        return "new"
+
+    for output, values in result["answers"].items():
+        if output in UNRECORDED_OUTPUTS:
+            continue
+        if output not in expected or not np.allclose(values, expected[output],
+                                                        rtol=REFERENCE_RTOL, atol=1e-12):
+            return "FAIL"
+    return "ok"
+
+
+def print_result(result, status):
+    print(f"{result['name']:<20} {result['seconds']:>9.3f} s"
+            f" {result['evaluations']:>13,} evals"
+            f" {result['evaluations_per_s']:>13,.0f} evals/s   reference: {status}")
+
+    for stage, timing in result["stages"].items():
+        print(f"    {stage:<22} {timing['calls']:>6} calls {timing['seconds']:>9.3f} s")
+
+    answers = result["answers"]
+    if "speedup" in answers:
+        print(f"    scalar (est.) {answers['scalar_seconds_est']:>9.3f} s"
+                f"   speedup {answers['speedup']:.1f}x   max |diff| {answers['max_diff']:.2e} in")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="run workloads whose name starts with one of these")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per workload, best kept")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--update-reference", action="store_true",
+                        help="store these answers as the new reference")
+    args = parser.parse_args(argv)
+
+    names = [name for name in WORKLOADS
+                if not args.only or any(name.startswith(p) for p in args.only)]
+
+    reference = {}
+    if os.path.exists(REFERENCE_PATH):
+        with open(REFERENCE_PATH) as f:
+            reference = json.load(f)
+
+    results = []
+    failed = False
+    for name in names:
+        result = run_workload(name, WORKLOADS[name], args.repeat)
+        status = check_reference(result, reference)
+        failed |= status == "FAIL"
+        print_result(result, status)
+        results.append(result)
+
+    if args.update_reference:
+        for result in results:
+            reference[result["name"]] = {
+                output: values for output, values in result["answers"].items()
+                if output not in UNRECORDED_OUTPUTS
+            }
+        with open(REFERENCE_PATH, "w") as f:
+            json.dump(reference, f, indent=1, sort_keys=True)
+        print(f"Reference written to {REFERENCE_PATH}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+    return 1 if failed and not args.update_reference else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,215 @@
+"""
+Part catalogs (shaft diameters, snap rings, keys, tubes).
+
+A catalog is a set of equal-length numpy columns kept sorted on its key
+column(s), so lookups are np.searchsorted calls.
+
+Vendor catalogs are read from CSV once and converted to one .npy file
+per column in a "<file>-<hash>.npycache" folder under CACHE_DIR
+($XDG_CACHE_HOME/shaft_catalogs, default ~/.cache/shaft_catalogs), so
+nothing is written next to the CSV. Later loads memory-map those files,
+so startup doesn't re-parse the CSV and worker processes share the same
+pages instead of each holding a copy.
+
+The built-in catalogs are registered by diameterSnap,
+keywayCalculations and hollowShaft. If SHAFT_CATALOG_DIR is set (read
+once at import), "<name>.csv" files in it replace the built-in catalogs
+of the same name when they are registered.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Dict, Tuple
+import numpy as np
+
+CATALOG_DIR_ENV = "SHAFT_CATALOG_DIR"
+CATALOG_DIR = os.environ.get(CATALOG_DIR_ENV)
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                            "shaft_catalogs")
+
+MM_PER_IN = 25.4
+
+_REGISTRY = {}
+
+
+@dataclass
+class Catalog:
+    name: str
+    key: Tuple[str, ...]
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self):
+        return len(self.columns[self.key[0]])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def sizes(self):
+        """The (first) key column."""
+        return self.columns[self.key[0]]
+
+    def index_at_least(self, value):
+        """
+        Index of the first row whose key is >= value (len(self) if none).
+        Works for scalars and arrays.
+        """
+        return np.searchsorted(self.sizes, value, side="left")
+
+    def row(self, i):
+        return {name: col[i] for name, col in self.columns.items()}
+
+    def select(self, mask):
+        """
+        Sub-catalog of the rows where mask is True, still sorted.
+        """
+        return Catalog(self.name, self.key,
+                        {name: col[mask] for name, col in self.columns.items()})
+
+
+def from_columns(name, columns, key):
+    """
+    Builds an in-memory catalog, sorting the rows on key
+    (a column name or tuple of names, first name most significant).
+    """
+    key = (key,) if isinstance(key, str) else tuple(key)
+    columns = {col: np.asarray(values) for col, values in columns.items()}
+
+    order = np.lexsort([columns[k] for k in reversed(key)])
+    return Catalog(name, key, {col: values[order] for col, values in columns.items()})
+
+
+def _parse_column(values):
+    try:
+        return np.array([float(v) for v in values])
+    except ValueError:
+        return np.array(values, dtype=str)
+
+
+def read_csv(path, name, key, size_columns=None, unit_column="unit"):
+    """
+    Reads a CSV catalog into memory. Numeric columns become float64,
+    everything else strings. If the file has a unit column, rows in
+    "mm" have their size_columns (default: the key columns) converted
+    to inches.
+    """
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    if not rows:
+        raise ValueError(f"Catalog {path} is empty.")
+
+    columns = {col: _parse_column([row[col] for row in rows]) for col in rows[0]}
+
+    key = (key,) if isinstance(key, str) else tuple(key)
+    if unit_column in columns:
+        mm = np.char.lower(columns[unit_column].astype(str)) == "mm"
+        for col in size_columns or key:
+            columns[col] = np.where(mm, columns[col] / MM_PER_IN, columns[col])
+        columns[unit_column] = np.where(mm, "in", columns[unit_column])
+
+    return from_columns(name, columns, key)
+
+
+def save_npy(catalog, folder):
+    """
+    Writes one .npy file per column plus a meta.json, atomically
+    (written to a temp folder and renamed into place).
+    """
+    tmp = folder + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for col, values in catalog.columns.items():
+        np.save(os.path.join(tmp, col + ".npy"), np.ascontiguousarray(values))
+
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"name": catalog.name, "key": list(catalog.key),
+                    "columns": list(catalog.columns)}, f)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+
+
+def load_npy(folder):
+    """
+    Memory-maps a catalog written by save_npy (read-only).
+    """
+    with open(os.path.join(folder, "meta.json")) as f:
+        meta = json.load(f)
+
+    columns = {
+        col: np.load(os.path.join(folder, col + ".npy"), mmap_mode="r")
+        for col in meta["columns"]
+    }
+    return Catalog(meta["name"], tuple(meta["key"]), columns)
+
+
+def load_csv(path, name, key, size_columns=None, cache_dir=None):
+    """
+    Loads a CSV catalog through its column cache, converting it on the
+    first load or whenever the CSV is newer than the cache.
+    """
+    if cache_dir is None:
+        path_hash = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]
+        cache_dir = os.path.join(CACHE_DIR, f"{os.path.basename(path)}-{path_hash}.npycache")
+    os.makedirs(os.path.dirname(cache_dir) or ".", exist_ok=True)
+    meta = os.path.join(cache_dir, "meta.json")
+
+    stale = (not os.path.exists(meta)
+                or os.path.getmtime(meta) < os.path.getmtime(path))
+
+    if stale:
+        save_npy(read_csv(path, name, key, size_columns), cache_dir)
+
+    return load_npy(cache_dir)
+
+
+def register(catalog, replace=True):
+    """
+    Registers catalog under its name. The first catalog registered
+    under a name is replaced by "<name>.csv" in SHAFT_CATALOG_DIR if
+    there is one (same key columns).
+    """
+    if catalog.name not in _REGISTRY and CATALOG_DIR:
+        path = os.path.join(CATALOG_DIR, catalog.name + ".csv")
+        if os.path.exists(path):
+            catalog = load_csv(path, catalog.name, catalog.key)
+
+    if replace or catalog.name not in _REGISTRY:
+        _REGISTRY[catalog.name] = catalog
+    return _REGISTRY[catalog.name]
+
+
+def get(name):
+    """
+    Registered catalog by name.
+    """
+    return _REGISTRY[name]
+
+
+_FINGERPRINTS = {}
+
+
+def fingerprint(name):
+    """
+    Short content hash of a catalog, so cached results can be tied to
+    the catalog they were solved against. Memoized per catalog object.
+    """
+    catalog = get(name)
+    cached = _FINGERPRINTS.get(name)
+    if cached is not None and cached[0] is catalog:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for col in sorted(catalog.columns):
+        digest.update(col.encode())
+        digest.update(np.ascontiguousarray(catalog.columns[col]).tobytes())
+
+    _FINGERPRINTS[name] = (catalog, digest.hexdigest()[:16])
+    return _FINGERPRINTS[name][1]
@@ -0,0 +1,317 @@
+"""
+Local design service.
+
+Serves main.design_shaft-style designs (shaft diameters, snap ring,
+gear key) over a Unix socket or TCP. The protocol is JSON lines: each
+request is one JSON object per line, each response one line, written
+in completion order, so clients match them up by "id".
+
+Request (every field optional):
+    {"id": 1,
+     "V": [...], "M": [...], "T": [...],   # N_SEG loads, batchDesign.SEGMENT_NAMES order
+     "r_ratio": 0.05,                        # one value or one per segment
+     "Sy": 60200, "target_fos": 2.0, "Sy_key": 41300}
+
+Response:
+    {"id": 1, "d": {...}, "fos": {...}, "snap_ring": {...},
+     "min_fos": ..., "key": {...}}    or    {"id": 1, "error": "..."}
+
+Requests from all clients that arrive within a short window are
+coalesced into one batchDesign.design_shafts call on a process pool.
+While every worker is busy, new requests queue up and go out together
+in the next batch, so bursts get bigger batches instead of longer
+queues.
+
+Run from this folder:
+    python designService.py --socket /tmp/shaft.sock
+    python designService.py --port 8765
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import main
+import batchDesign
+
+# how long the batcher waits for more requests after the first one (s)
+DEFAULT_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 512
+
+DEFAULTS = {
+    "Sy": main.MATERIALS[0].Sy_psi,
+    "target_fos": main.TARGET_FOS_LIST[0],
+    "Sy_key": main.KEY_MATERIALS[0].Sy_psi,
+}
+
+
+def parse_request(message):
+    """
+    Per-shaft columns for one request, with defaults filled in from
+    main.build_segments and DEFAULTS. Raises ValueError if malformed.
+    """
+    if not isinstance(message, dict):
+        raise ValueError("Request must be a JSON object.")
+
+    row = {}
+    for name in ("V", "M", "T"):
+        values = np.asarray(message.get(name, getattr(batchDesign.TEMPLATE, name)), dtype=float)
+        if values.shape != (batchDesign.N_SEG,):
+            raise ValueError(f'"{name}" must be a list of {batchDesign.N_SEG} loads '
+                                f"in the order {batchDesign.SEGMENT_NAMES}.")
+        row[name] = values
+
+    r_ratio = np.asarray(message.get("r_ratio", batchDesign.TEMPLATE.r_ratio), dtype=float)
+    if r_ratio.shape not in ((), (batchDesign.N_SEG,)):
+        raise ValueError(f'"r_ratio" must be one value or {batchDesign.N_SEG} values.')
+    row["r_ratio"] = np.broadcast_to(r_ratio, (batchDesign.N_SEG,))
+
+    for name, default in DEFAULTS.items():
+        row[name] = float(message.get(name, default))
+
+    return row
+
+
+def _number(x):
+    x = float(x)
+    return None if math.isnan(x) else x
+
+
+def result_dict(record):
+    """
+    JSON-ready form of one batchDesign result record (nan -> null).
+    """
+    def per_segment(values):
+        return {seg: _number(v) for seg, v in zip(batchDesign.SEGMENT_NAMES, values)}
+
+    return {
+        "d": per_segment(record.d),
+        "Kt": per_segment(record.Kt),
+        "Kts": per_segment(record.Kts),
+        "fos": per_segment(record.fos),
+        "snap_ring": {"d": _number(record.snap_ring_d), "fos": _number(record.snap_ring_fos)},
+        "min_fos": _number(record.min_fos),
+        "key": {
+            "target_fos": _number(record.key_target_fos),
+            "L": _number(record.key_L),
+            "w": _number(record.key_w),
+            "H": _number(record.key_H),
+            "fos": _number(record.key_fos),
+        },
+    }
+
+
+def solve_batch(rows):
+    """
+    Runs in a pool worker: one design_shafts call for all rows. If the
+    batch fails (a design outside the solver brackets), it is split in
+    halves and retried, so only the bad requests get the error.
+    """
+    columns = {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+    try:
+        results = batchDesign.design_shafts(columns)
+    except (ValueError, RuntimeError) as err:
+        if len(rows) == 1:
+            return [{"error": str(err)}]
+        half = len(rows) // 2
+        return solve_batch(rows[:half]) + solve_batch(rows[half:])
+
+    return [result_dict(record) for record in results]
+
+
+class MicroBatcher:
+    """
+    Collects submitted requests into batches and runs them on the pool.
+
+    After the first request of a batch arrives, waits window seconds
+    and takes everything queued by then (up to max_batch). At most
+    max_in_flight batches run at once; while they do, requests keep
+    queueing for the next batch.
+    """
+
+    def __init__(self, pool, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH,
+                    max_in_flight=None):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight or os.cpu_count() or 1
+
+        self.queue = None
+        self.batches = 0
+        self.requests = 0
+        self._tasks = set()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._keep(asyncio.create_task(self._collect()))
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _keep(self, task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+
+            await self._in_flight.acquire()
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            self.batches += 1
+            self.requests += len(batch)
+            self._keep(asyncio.create_task(self._dispatch(batch)))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.pool, solve_batch, [row for row, _ in batch]
+            )
+        except Exception as err:
+            # worker died or the batch could not be sent
+            results = [{"error": f"Solver failed: {err!r}"}] * len(batch)
+        finally:
+            self._in_flight.release()
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def handle_client(reader, writer, batcher):
+    """
+    Answers every line from one connection. Requests are handled
+    concurrently, so a client can pipeline many of them.
+    """
+    lock = asyncio.Lock()
+    pending = set()
+
+    async def answer(line):
+        request_id = None
+        try:
+            message = json.loads(line)
+            if isinstance(message, dict):
+                request_id = message.get("id")
+            row = parse_request(message)
+        except (ValueError, TypeError) as err:
+            response = {"error": str(err)}
+        else:
+            response = await batcher.submit(row)
+
+        data = json.dumps({"id": request_id, **response}).encode() + b"\n"
+        async with lock:
+            writer.write(data)
+            await writer.drain()
+
+    try:
+        while line := await reader.readline():
+            if line.strip():
+                task = asyncio.create_task(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(socket_path=None, host="127.0.0.1", port=8765,
+                window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, workers=None):
+    """
+    Runs the service until cancelled: on a Unix socket if socket_path
+    is given, otherwise on TCP host:port.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batcher = MicroBatcher(pool, window, max_batch, workers)
+        batcher.start()
+
+        # start the workers before the first client waits on them
+        loop = asyncio.get_running_loop()
+        warm_up = [parse_request({})]
+        await asyncio.gather(*(loop.run_in_executor(pool, solve_batch, warm_up)
+                                for _ in range(workers)))
+
+        handler = functools.partial(handle_client, batcher=batcher)
+        if socket_path:
+            server = await asyncio.start_unix_server(handler, path=socket_path)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(handler, host, port)
+            where = f"{host}:{port}"
+
+        print(f"Design service listening on {where} ({workers} workers)", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await batcher.close()
+
+
+async def request_designs(messages, socket_path=None, host="127.0.0.1", port=8765):
+    """
+    Client side: sends the requests over one connection and returns the
+    responses in request order. Requests without an "id" get their
+    position as id.
+    """
+    if socket_path:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    messages = [{"id": i, **message} for i, message in enumerate(messages)]
+    for message in messages:
+        writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+    responses = {}
+    while len(responses) < len(messages):
+        response = json.loads(await reader.readline())
+        responses[response["id"]] = response
+
+    writer.close()
+    await writer.wait_closed()
+    return [responses[message["id"]] for message in messages]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=None, metavar="PATH",
+                        help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW * 1000)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port,
+                            args.window_ms / 1000, args.max_batch, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+"""
+Design-space sweep over materials x target FoS x fillet radius ratio.
+
+Each combination runs the full shaft / snap ring / key design from
+main.design_shaft. Combinations are grouped into chunks and spread
+over a process pool, and rows are yielded as soon as each chunk
+finishes.
+
+Run from this folder:
+    python designSweep.py --out sweep.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import main
+import resultCache
+import shaftLayout
+
+
+def sweep_combinations(materials, target_fos_list, r_values):
+    return [
+        (material, target_fos, float(r_ratio))
+        for material in materials
+        for target_fos in target_fos_list
+        for r_ratio in r_values
+    ]
+
+
+def _feature_columns(columns, features):
+    # one feature keeps the plain column names, several get the segment name
+    return {col if len(features) == 1 else f"{col} {name}": value
+            for name, values in features.items()
+            for col, value in zip(columns, values)}
+
+
+def design_row(material, target_fos, r_ratio, Sy_key, fos_key_diff, cache=None,
+                layout=None):
+    """
+    Runs one combination on layout (default: the Stage 2 shaft) and
+    flattens it into a table row: a diameter per shaft segment plus the
+    snap ring and key columns, with the segment name added when the
+    layout has more than one of them.
+    Designs that fall outside the solver brackets are kept as rows with
+    the error message filled in.
+    """
+    row = {
+        "material": material.name,
+        "Sy": material.Sy_psi,
+        "target_fos": target_fos,
+        "r_ratio": r_ratio,
+        "error": "",
+    }
+
+    try:
+        design = main.design_shaft(
+            material.Sy_psi, target_fos, Sy_key, fos_key_diff, r_ratio, cache,
+            layout=layout
+        )
+    except (ValueError, RuntimeError) as err:
+        row["error"] = str(err)
+        return row
+
+    snap_rings, keys = design["snap_rings"], design["keys"]
+
+    for seg in design["segments"].values():
+        if seg.name in snap_rings:
+            continue
+        row[f"d {seg.name}"] = seg.d
+
+    row["min_fos"] = design["min_shaft_fos"]
+
+    # snap ring values are (d_out, fos, d_in); the seat is already a segment column
+    row.update(_feature_columns(("snap_ring_d", "snap_ring_fos"), snap_rings))
+    row.update(_feature_columns(("key_L", "key_w", "key_H", "key_fos"), keys))
+
+    return row
+
+
+def run_chunk(chunk, Sy_key, fos_key_diff, cache_path=None, layout=None):
+    # each worker opens its own connection to the shared cache file
+    cache = resultCache.ResultCache(cache_path) if cache_path else None
+    try:
+        return [
+            design_row(material, target_fos, r_ratio, Sy_key, fos_key_diff, cache, layout)
+            for material, target_fos, r_ratio in chunk
+        ]
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def run_sweep(materials, target_fos_list, r_values,
+                Sy_key=None, fos_key_diff=main.FOS_KEY_DIFF,
+                max_workers=None, chunk_size=4, cache_path=None, layout=None):
+    """
+    Generator of result rows, in completion order.
+    max_workers=None uses every core. With cache_path, solves already
+    in that result cache file are reused. layout is a
+    shaftLayout.CompiledLayout (default: the Stage 2 shaft).
+    """
+    if Sy_key is None:
+        Sy_key = main.KEY_MATERIALS[0].Sy_psi
+
+    combos = sweep_combinations(materials, target_fos_list, r_values)
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(run_chunk, chunk, Sy_key, fos_key_diff, cache_path, layout)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def write_rows(rows, out):
+    """
+    Streams rows to a CSV file object. The header comes from the first
+    successful row so error rows don't drop the diameter columns.
+    Returns the list of rows written.
+    """
+    written = []
+    writer = None
+    pending = []
+
+    for row in rows:
+        written.append(row)
+
+        if writer is None:
+            if row["error"]:
+                pending.append(row)
+                continue
+            writer = csv.DictWriter(out, fieldnames=list(row), restval="")
+            writer.writeheader()
+            writer.writerows(pending)
+
+        writer.writerow(row)
+        out.flush()
+
+    if writer is None and pending:
+        writer = csv.DictWriter(out, fieldnames=list(pending[0]))
+        writer.writeheader()
+        writer.writerows(pending)
+
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="-", help="CSV output path ('-' for stdout)")
+    parser.add_argument("--r-min", type=float, default=main.R_MIN)
+    parser.add_argument("--r-max", type=float, default=main.R_MAX)
+    parser.add_argument("--r-steps", type=int, default=main.R_STEPS)
+    parser.add_argument("--fos", type=float, nargs="+", default=main.TARGET_FOS_LIST)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--layout", default=None, help="layout file (default: Stage 2 shaft)")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="SQLite result cache to reuse across runs")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    r_values = np.linspace(args.r_min, args.r_max, args.r_steps)
+    layout = shaftLayout.load_layout(args.layout) if args.layout else None
+    rows = run_sweep(main.MATERIALS, args.fos, r_values,
+                        max_workers=args.workers, chunk_size=args.chunk_size,
+                        cache_path=args.cache, layout=layout)
+
+    if args.out == "-":
+        write_rows(rows, sys.stdout)
+    else:
+        with open(args.out, "w", newline="") as f:
+            write_rows(rows, f)
@@ -1,3 +1,6 @@
+import numpy as np
+import catalogs
+
 STANDARD_DIAMETERS = [
     0.25,   # 1/4"
     0.375,  # 3/8"
@@ -62,23 +65,61 @@ SNAP_RING_STANDARD_DIAMETER = [
     2.875
 ]
 
+catalogs.register(catalogs.from_columns("shaft", {"d": STANDARD_DIAMETERS}, key="d"),
+                    replace=False)
+catalogs.register(catalogs.from_columns("snapRing", {"d": SNAP_RING_STANDARD_DIAMETER}, key="d"),
+                    replace=False)
+
+
+def catalog(type):
+    """
+    Sorted diameter array of the catalog for this type.
+    """
+    return catalogs.get("snapRing" if type == "snapRing" else "shaft").sizes
+
+
+def snap_index(d_required, type):
+    """
+    Index into catalog(type) of the smallest size >= d_required.
+    """
+    sizes = catalog(type)
+    i = int(np.searchsorted(sizes, d_required, side="left"))
+    if i == len(sizes):
+        raise ValueError("Required diameter exceeds available standard sizes.")
+    return i
+
+
+def next_size_index(index, type):
+    """
+    Index of the next larger catalog size.
+    """
+    if index + 1 >= len(catalog(type)):
+        raise ValueError("Required diameter exceeds available standard sizes.")
+    return index + 1
+
+
 def snap_diameter(d_required , type):
-        
-        ls = SNAP_RING_STANDARD_DIAMETER if type == "snapRing" else STANDARD_DIAMETERS
-        for d_std in ls:
-            if d_std >= d_required:
-                return d_std
+    return float(catalog(type)[snap_index(d_required, type)])
+
+
+def snap_diameters(d_required, type):
+    """
+    Vectorized snap_diameter for an array of diameters.
+    """
+    sizes = catalog(type)
+    idx = np.searchsorted(sizes, d_required, side="left")
+    if np.any(idx == len(sizes)):
         raise ValueError("Required diameter exceeds available standard sizes.")
+    return sizes[idx]
 
 
 def snap_all_diameters(segments , type):
 
-    
-    changed = False
-    for seg in segments.values():
-        d_old = seg.d
-        seg.d = snap_diameter(seg.d , type)
+    segs = list(segments.values())
+    d_old = np.array([seg.d for seg in segs])
+    d_new = snap_diameters(d_old, type)
+
+    for seg, d in zip(segs, d_new):
+        seg.d = float(d)
 
-        if abs(seg.d - d_old) > 1e-9:
-            changed = True
-    return changed
+    return bool(np.any(np.abs(d_new - d_old) > 1e-9))
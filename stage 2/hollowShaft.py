@@ -0,0 +1,364 @@
+"""
+Hollow-shaft design: minimum-mass (OD, ID) per segment.
+
+Every segment gets a tube from the "tube" catalog (outer diameter OD,
+bore ID; ID = 0 is solid bar) and is checked with the annular section
+of snapRingCalculation.fos_calculation. The mass of a segment is
+density * pi / 4 * (OD^2 - ID^2) * length.
+
+Two bore modes:
+- "stepped": every segment picks its own bore.
+- "through": one bore through the whole shaft (drilled or tube stock),
+  every segment picks its OD for that bore. All candidate bores are
+  tried at once and the lightest shaft wins.
+
+Candidates are evaluated as one flat array of (segment, tube) pairs.
+Most pairs are pruned before the stress evaluation:
+- a tube's FoS never beats the solid bar of the same OD, so ODs below
+  the solid required diameter cannot work;
+- (stepped) the solid bar of the smallest standard OD that works is
+  always feasible, so tubes heavier than it are never better;
+- walls thinner than min_wall are left out.
+
+Kt/Kts come from the shoulder charts with OD as the diameter (the bore
+is not in the charts), so changing an OD changes the factors of its
+shoulders. Like solve_discrete, the selection is repeated until the ODs
+come out the same as on the pass before.
+
+Run from this folder:
+    python hollowShaft.py --bore through --feature-wall 0.25
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+
+import catalogs
+import diameterSnap
+import DiameterCalculations
+import snapRingCalculation
+import shaftLayout
+import shaftState
+import instrumentation
+
+# lb / in^3
+STEEL_DENSITY = 0.284
+
+# thinnest wall in the built-in catalog (in)
+CATALOG_MIN_WALL = 0.0625
+
+# standard bore sizes (in); 0 = solid
+STANDARD_BORES = [
+    0.0,
+    0.125,
+    0.1875,
+    0.25,
+    0.3125,
+    0.375,
+    0.4375,
+    0.5,
+    0.5625,
+    0.625,
+    0.75,
+    0.875,
+    1.0,
+]
+
+BORE_MODES = ("stepped", "through")
+
+
+def _tube_columns():
+    OD, ID = np.meshgrid(diameterSnap.STANDARD_DIAMETERS, STANDARD_BORES, indexing="ij")
+    keep = (ID == 0) | (OD - ID >= 2 * CATALOG_MIN_WALL)
+    return {"OD": OD[keep], "ID": ID[keep]}
+
+
+catalogs.register(catalogs.from_columns("tube", _tube_columns(), key=("OD", "ID")),
+                    replace=False)
+
+
+@dataclass
+class HollowDesign:
+    names: List[str]
+    OD: np.ndarray
+    ID: np.ndarray
+    Kt: np.ndarray
+    Kts: np.ndarray
+    fos: np.ndarray
+    mass: np.ndarray
+    # the same segments as solid bar (solve_discrete)
+    solid_d: np.ndarray
+    solid_mass: np.ndarray
+    # per shaft: ODs settled; length of the last OD cycle (0 = none)
+    converged: np.ndarray
+    cycle_length: np.ndarray
+    passes: int
+
+    def report(self):
+        lines = [f"{'Segment':<24} {'OD':>7} {'ID':>7} {'FoS':>7} {'mass':>8} {'solid':>8}"]
+        for i, name in enumerate(self.names):
+            lines.append(f"{name:<24} {self.OD[i]:>7.4f} {self.ID[i]:>7.4f} {self.fos[i]:>7.3f}"
+                            f" {self.mass[i]:>8.4f} {self.solid_mass[i]:>8.4f}")
+        total, solid = self.mass.sum(), self.solid_mass.sum()
+        lines.append(f"{'Total':<24} {'':>7} {'':>7} {'':>7} {total:>8.4f} {solid:>8.4f}"
+                        f"   ({1 - total / solid:.1%} lighter)")
+        return "\n".join(lines)
+
+
+def tube_area(OD, ID):
+    """
+    OD^2 - ID^2; mass per length is density * pi / 4 times this.
+    """
+    return OD**2 - ID**2
+
+
+def _candidates(d_req, min_wall, OD, ID, max_area=None):
+    """
+    (segment, row) index pairs of the tubes worth evaluating.
+    """
+    ok = OD[None, :] >= d_req[:, None]
+    ok &= (ID[None, :] == 0) | (OD[None, :] - ID[None, :] >= 2 * min_wall[:, None])
+    if max_area is not None:
+        ok &= tube_area(OD, ID)[None, :] <= max_area[:, None]
+
+    seg, row = np.nonzero(ok)
+    if instrumentation.ENABLED:
+        instrumentation.count("hollow.candidates", seg.size)
+        instrumentation.count("hollow.pruned", ok.size - seg.size)
+    return seg, row
+
+
+def _feasible(section, seg, OD, ID):
+    fos = snapRingCalculation.fos_calculation(
+        section["V"][seg], section["M"][seg], section["T"][seg], section["Sy"][seg],
+        section["Kt"][seg], section["Kts"][seg], OD, ID
+    )
+    # solid bar at or above the required diameter passes by construction
+    return (fos >= section["target_fos"][seg]) | (ID == 0)
+
+
+def _lightest(seg, area, OD, n):
+    """
+    For each of n segments, the position in seg of its lightest pair
+    (ties go to the smaller OD); -1 where a segment has none.
+    """
+    order = np.lexsort((OD, area, seg))
+    segments, starts = np.unique(seg[order], return_index=True)
+    first = np.full(n, -1, dtype=np.intp)
+    first[segments] = order[starts]
+    return first
+
+
+def select_stepped(section, d_req, min_wall, tubes):
+    """
+    Lightest catalog tube per segment at the current Kt/Kts, with OD at
+    least d_req. section holds V, M, T, Sy, Kt, Kts and target_fos of
+    the segments. Returns (OD, ID).
+    """
+    OD, ID = tubes["OD"], tubes["ID"]
+    n = d_req.size
+
+    # the solid bar every segment falls back on bounds the area
+    solid = tubes.select(ID == 0)["OD"]
+    i_solid = np.searchsorted(solid, d_req, side="left")
+    if np.any(i_solid == solid.size):
+        raise ValueError("Required diameter exceeds available standard sizes.")
+    max_area = solid[i_solid]**2
+
+    seg, row = _candidates(d_req, min_wall, OD, ID, max_area)
+    feasible = _feasible(section, seg, OD[row], ID[row])
+    seg, row = seg[feasible], row[feasible]
+
+    best = row[_lightest(seg, tube_area(OD[row], ID[row]), OD[row], n)]
+    return OD[best], ID[best]
+
+
+def select_through(section, d_req, min_wall, tubes, lengths, n_seg):
+    """
+    Lightest shaft with one bore for all of its segments, for every
+    shaft in section (n_seg segments each). Returns (OD, ID).
+    """
+    OD, ID = tubes["OD"], tubes["ID"]
+    n = d_req.size
+    n_shafts = n // n_seg
+
+    bores = np.unique(ID)
+    bore_of_row = np.searchsorted(bores, ID)
+
+    seg, row = _candidates(d_req, min_wall, OD, ID)
+    feasible = _feasible(section, seg, OD[row], ID[row])
+    seg, row = seg[feasible], row[feasible]
+
+    # smallest feasible OD per (segment, bore)
+    best_od = np.full((n, bores.size), np.inf)
+    np.minimum.at(best_od, (seg, bore_of_row[row]), OD[row])
+
+    area = best_od**2 - bores[None, :]**2
+    mass = (area * lengths[:, None]).reshape(n_shafts, n_seg, bores.size).sum(axis=1)
+    # a bore that some segment cannot take is inf; argmin keeps the
+    # smallest bore on ties
+    choice = np.argmin(mass, axis=1)
+    if np.any(~np.isfinite(mass[np.arange(n_shafts), choice])):
+        raise ValueError("Required diameter exceeds available standard sizes.")
+
+    bore = np.repeat(bores[choice], n_seg)
+    return best_od[np.arange(n), np.repeat(choice, n_seg)], bore
+
+
+def design_hollow(state, Sy, target_fos, lengths=None, min_wall=CATALOG_MIN_WALL,
+                    bore="stepped", n_seg=None, density=STEEL_DENSITY,
+                    tol=1e-7, max_iter=20):
+    """
+    Minimum-mass hollow design of an unsolved ShaftState or
+    shaftLayout.CompiledLayout (neither is changed). Sy, target_fos,
+    lengths and min_wall can be scalars or one value per segment;
+    lengths default to the layout's segment lengths when it gives them
+    all, else to 1 in, so mass is per inch. For bore="through" on a
+    state made with tile(), n_seg is the number of segments per shaft
+    (default: the whole state is one shaft).
+
+    Returns a HollowDesign. If a shaft's ODs come back to an earlier
+    set (a cycle through the shoulder factors), the largest OD of the
+    cycle becomes a lower limit for each segment and the passes go on;
+    the limits only go up, so the shaft settles on a set that works at
+    its own Kt/Kts. Each shaft of a tiled state settles on its own, and
+    only the shafts still moving are evaluated. converged is False for
+    shafts still moving after max_iter passes.
+    """
+    if bore not in BORE_MODES:
+        raise ValueError(f"bore must be one of {BORE_MODES}")
+
+    if isinstance(state, shaftLayout.CompiledLayout):
+        if lengths is None:
+            lengths = state.segment_lengths()
+        state = state.state
+
+    n = len(state.names)
+    Sy = np.broadcast_to(np.asarray(Sy, dtype=float), (n,))
+    target_fos = np.broadcast_to(np.asarray(target_fos, dtype=float), (n,))
+    lengths = np.broadcast_to(np.asarray(1.0 if lengths is None else lengths, dtype=float), (n,))
+    min_wall = np.broadcast_to(np.asarray(min_wall, dtype=float), (n,))
+    n_seg = n if n_seg is None else n_seg
+
+    tubes = catalogs.get("tube")
+    n_shafts = n // n_seg
+
+    solid = state.copy()
+    shaftState.solve_discrete(solid, Sy, target_fos, tol=tol)
+
+    # solve_discrete leaves Kt/Kts at the continuous diameters
+    work = solid.copy()
+    shaftState.update_stress_concentration(work)
+    ID = np.zeros(n)
+
+    def select(seg, d_req):
+        section = {"V": work.V[seg], "M": work.M[seg], "T": work.T[seg],
+                    "Kt": work.Kt[seg], "Kts": work.Kts[seg],
+                    "Sy": Sy[seg], "target_fos": target_fos[seg]}
+        if bore == "stepped":
+            return select_stepped(section, d_req, min_wall[seg], tubes)
+        return select_through(section, d_req, min_wall[seg], tubes, lengths[seg], n_seg)
+
+    def per_shaft(values):
+        return values.reshape(-1, n_seg)
+
+    # ODs before each pass; shafts drop out once settled
+    history = []
+    od_min = np.zeros(n)
+    active = np.ones(n_shafts, dtype=bool)
+    converged = np.zeros(n_shafts, dtype=bool)
+    cycle_length = np.zeros(n_shafts, dtype=int)
+    passes = 0
+
+    with instrumentation.stage("design_hollow"):
+        for passes in range(1, max_iter + 1):
+
+            shafts = np.flatnonzero(active)
+            seg = np.flatnonzero(np.repeat(active, n_seg))
+
+            d_req = DiameterCalculations.solve_required_diameter_batch(
+                work.V[seg], work.M[seg], work.T[seg], Sy[seg],
+                work.Kt[seg], work.Kts[seg], target_fos[seg], d_guess=work.d[seg]
+            )
+            d_req = np.maximum(d_req, od_min[seg])
+            history.append(work.d.copy())
+            OD, ID[seg] = select(seg, d_req)
+
+            # how many passes back each shaft had the same ODs
+            back = np.zeros(shafts.size, dtype=int)
+            for k in range(1, len(history) + 1):
+                same = np.all(per_shaft(history[-k][seg] == OD), axis=1)
+                back[same & (back == 0)] = k
+
+            work.d[seg] = OD
+            converged[shafts[back == 1]] = True
+            active[shafts[back == 1]] = False
+
+            # cycling shafts go on from the largest OD of their cycle
+            for shaft, k in zip(shafts[back > 1], back[back > 1]):
+                instrumentation.count("hollow.cycles")
+                part = slice(shaft * n_seg, (shaft + 1) * n_seg)
+                od_min[part] = np.max([d_old[part] for d_old in history[-k:]], axis=0)
+                work.d[part] = od_min[part]
+                cycle_length[shaft] = k
+
+            shaftState.update_stress_concentration(work)
+
+            if not active.any():
+                break
+
+    OD = work.d
+    fos = snapRingCalculation.fos_calculation(
+        work.V, work.M, work.T, Sy, work.Kt, work.Kts, OD, ID
+    )
+    per_length = density * np.pi / 4 * lengths
+
+    return HollowDesign(
+        names=list(state.names),
+        OD=OD,
+        ID=ID,
+        Kt=work.Kt,
+        Kts=work.Kts,
+        fos=fos,
+        mass=per_length * tube_area(OD, ID),
+        solid_d=solid.d,
+        solid_mass=per_length * solid.d**2,
+        converged=converged,
+        passes=passes,
+        cycle_length=cycle_length,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", default=None, help="layout file (default: Stage 2 shaft)")
+    parser.add_argument("--bore", choices=BORE_MODES, default="stepped")
+    parser.add_argument("--min-wall", type=float, default=CATALOG_MIN_WALL)
+    parser.add_argument("--feature-wall", type=float, default=None,
+                        help="minimum wall under keyways and snap ring grooves")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import main
+
+    args = parse_args()
+    layout = (shaftLayout.load_layout(args.layout) if args.layout
+                else shaftLayout.default_layout())
+
+    min_wall = np.full(len(layout), args.min_wall)
+    if args.feature_wall is not None:
+        features = np.concatenate([layout.keyways, layout.snap_rings])
+        min_wall[features] = np.maximum(min_wall[features], args.feature_wall)
+
+    # mass per inch unless the layout gives every segment a length
+    design = design_hollow(layout, main.MATERIALS[0].Sy_psi, main.TARGET_FOS_LIST[0],
+                            min_wall=min_wall, bore=args.bore)
+    print(design.report())
+    if design.cycle_length[0]:
+        print(f"ODs cycled with length {design.cycle_length[0]};"
+                " settled from the largest OD of the cycle.")
+    if not design.converged[0]:
+        print(f"ODs did not settle in {design.passes} passes.")
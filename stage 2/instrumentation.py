@@ -0,0 +1,136 @@
+"""
+Opt-in instrumentation for the solver stack.
+
+Off by default: every hook starts with a check of the module-level
+ENABLED flag, so the disabled cost is one attribute lookup per call.
+
+    with instrumentation.collect() as stats:
+        main.design_shaft(...)
+    print(stats.report())
+
+Counters (evaluations are counted per load case, so a batch call on
+1000 diameters adds 1000):
+- von_mises_stress / fos_calculation (solid shaft)
+- snap_ring.von_mises_stress / snap_ring.fos_calculation
+- bisection_iterations, newton_iterations, brent_iterations
+- warm_bracket_misses (warm-started cases that fell back to the full bracket)
+- fixed_point_passes, fixed_point_unconverged (continuous solves that hit max_iter)
+- snap_events (diameters moved by snapping), snap_ring_step_ups, snap_cycles
+- radius_evaluations, radius_pruned (radiusSearch)
+- hollow.candidates, hollow.pruned, hollow.cycles (hollowShaft)
+- pareto.evaluated (paretoExplorer partial designs)
+
+Stages record call count and wall time, plus a list of nested spans
+that write_trace saves in Chrome trace-event format (chrome://tracing,
+Perfetto, speedscope). collect(profile=True) also runs cProfile over
+the whole block.
+"""
+
+import cProfile
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+ENABLED = False
+
+_stats = None
+
+
+@dataclass
+class SolverStats:
+    counters: Counter = field(default_factory=Counter)
+    stage_calls: Counter = field(default_factory=Counter)
+    stage_time: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    # (name, start, end, depth), times in seconds from the start of collect()
+    spans: List[Tuple[str, float, float, int]] = field(default_factory=list)
+    profiler: Optional[cProfile.Profile] = None
+    t0: float = field(default_factory=time.perf_counter)
+    depth: int = 0
+
+    def as_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "stages": {
+                name: {"calls": self.stage_calls[name], "seconds": self.stage_time[name]}
+                for name in self.stage_calls
+            },
+        }
+
+    def report(self):
+        lines = ["Counters:"]
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"  {name:<32} {n:>14,}")
+
+        lines.append("Stages:")
+        for name in self.stage_calls:
+            lines.append(f"  {name:<32} {self.stage_calls[name]:>8} calls"
+                            f" {self.stage_time[name]:>10.4f} s")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """
+        Spans as Chrome trace events ("X" complete events, microseconds).
+        """
+        events = [
+            {"name": name, "ph": "X", "pid": 0, "tid": 0,
+                "ts": start * 1e6, "dur": (end - start) * 1e6, "args": {"depth": depth}}
+            for name, start, end, depth in self.spans
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events}, f)
+
+
+def count(name, n=1):
+    if ENABLED:
+        _stats.counters[name] += int(n)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as a named stage. No-op when disabled.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    stats = _stats
+    start = time.perf_counter()
+    stats.depth += 1
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stats.depth -= 1
+        stats.stage_calls[name] += 1
+        stats.stage_time[name] += end - start
+        stats.spans.append((name, start - stats.t0, end - stats.t0, stats.depth))
+
+
+@contextmanager
+def collect(profile=False):
+    """
+    Enables instrumentation for the block and yields the SolverStats.
+    With profile=True a cProfile.Profile runs over the block and is left
+    in stats.profiler (pstats.Stats(stats.profiler) to read it).
+    """
+    global ENABLED, _stats
+
+    previous = (ENABLED, _stats)
+    stats = SolverStats()
+
+    if profile:
+        stats.profiler = cProfile.Profile()
+
+    ENABLED, _stats = True, stats
+    if stats.profiler is not None:
+        stats.profiler.enable()
+    try:
+        yield stats
+    finally:
+        if stats.profiler is not None:
+            stats.profiler.disable()
+        ENABLED, _stats = previous
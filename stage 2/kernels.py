@@ -0,0 +1,490 @@
+"""
+Scalar kernels for the per-shaft pipeline, compiled with Numba when it
+is installed.
+
+A single shaft is a handful of segments, so the NumPy solvers spend
+most of their time on array-call overhead rather than arithmetic. The
+kernels run the same algorithms as plain loops over floats:
+
+- _bisect:          rootSolvers.bisection_batch for one case, with the
+                    same warm bracket (rootSolvers.warm_bracket)
+- _concentration:   StressConcentration.stress_concentration, np.interp
+                    on the compiled TABLES done by hand
+- _solve_discrete:  shaftState.solve_discrete, with the dirty-segment
+                    worklist of solve_iterative, the snap to the
+                    standard sizes and the snap cycle rule
+- _snap_ring:       snapRingCalculation.solve_discrete_snap_ring,
+                    continuous solve then step up the catalog
+
+Numba is optional and the compiled path is opt-in: ENABLED is True
+only when Numba imports and SHAFT_ENABLE_JIT is set. Otherwise
+solve_discrete and solve_discrete_snap_ring hand over to the NumPy
+solvers, so callers use them either way. If a kernel fails to compile
+the dispatchers warn once and stay on the NumPy solvers. The *_kernel
+functions always run the kernels (interpreted when Numba is missing),
+which is what cross_check compares against the NumPy path. The
+kernels record the solve_discrete stage time but none of the
+instrumentation counters.
+
+Run from this folder:
+    python kernels.py --shafts 200
+"""
+
+import argparse
+import math
+import os
+import time
+import warnings
+from dataclasses import dataclass
+import numpy as np
+
+import DiameterCalculations
+import StressConcentration
+import diameterSnap
+import instrumentation
+import rootSolvers
+import shaftState
+import snapRingCalculation
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT_ENABLE_ENV = "SHAFT_ENABLE_JIT"
+
+HAVE_NUMBA = numba is not None
+ENABLED = HAVE_NUMBA and bool(os.environ.get(JIT_ENABLE_ENV))
+
+# compile errors that send the dispatchers back to the NumPy solvers
+JIT_ERRORS = (numba.core.errors.NumbaError,) if HAVE_NUMBA else ()
+
+# bracket and tolerance of the batch solvers
+D_LOW = 0.1
+D_HIGH = 5.0
+BISECT_TOL = 1e-5
+BISECT_MAX_ITER = 100
+WARM_WIDTH = rootSolvers.WARM_WIDTH
+
+# kernel status codes; >= 0 is success
+OUTSIDE_BRACKET = -1
+OUTSIDE_CATALOG = -2
+
+# relative tolerance of cross_check, the bisection's FoS tolerance
+CHECK_RTOL = 1e-5
+
+
+def _jit(func):
+    if HAVE_NUMBA:
+        return numba.njit(cache=True)(func)
+    return func
+
+
+# --- scalar kernels ---
+
+@_jit
+def _fos(d_out, d_in, V, M, T, Sy, Kt, Kts):
+    """
+    Von Mises FoS of an annular section (d_in = 0 is solid bar, and
+    then gives the same numbers as DiameterCalculations.fos_calculation).
+    A zero-area section gives 0, like rootSolvers.safe_fos.
+    """
+    if d_out <= d_in:
+        return 0.0
+
+    J = (math.pi / 32) * (d_out**4 - d_in**4)
+    I = (math.pi / 64) * (d_out**4 - d_in**4)
+    c = d_out / 2
+
+    sigma_b = Kt * (c * M / I)
+    tau = Kts * (c * T / J) + 16 * V / (3 * math.pi * (d_out**2 - d_in**2))
+
+    sigma_vm = math.sqrt(sigma_b**2 + 3 * tau**2)
+    if sigma_vm == 0.0:
+        return math.inf
+    return Sy / sigma_vm
+
+
+@_jit
+def _bisect(d_in, V, M, T, Sy, Kt, Kts, target_fos, d_low, d_high, d_guess):
+    """
+    Diameter where the FoS hits target_fos on [d_low, d_high], or nan
+    if it is not bracketed. d_guess > 0 tries the warm bracket first.
+    """
+    if d_guess > 0:
+        near_low = max(d_guess * (1 - WARM_WIDTH), d_low)
+        near_high = min(d_guess * (1 + WARM_WIDTH), d_high)
+        if (_fos(near_low, d_in, V, M, T, Sy, Kt, Kts) <= target_fos
+                and _fos(near_high, d_in, V, M, T, Sy, Kt, Kts) >= target_fos):
+            d_low = near_low
+            d_high = near_high
+
+    if (_fos(d_high, d_in, V, M, T, Sy, Kt, Kts) < target_fos
+            or _fos(d_low, d_in, V, M, T, Sy, Kt, Kts) > target_fos):
+        return math.nan
+
+    d_mid = 0.0
+    for _ in range(BISECT_MAX_ITER):
+        d_mid = 0.5 * (d_low + d_high)
+        fos = _fos(d_mid, d_in, V, M, T, Sy, Kt, Kts)
+
+        if abs(fos - target_fos) < BISECT_TOL:
+            break
+
+        if fos > target_fos:
+            d_high = d_mid
+        else:
+            d_low = d_mid
+
+    return d_mid
+
+
+@_jit
+def _interp(x, xp, fp):
+    # np.interp: linear inside the table, end values outside it
+    n = xp.size
+    if x <= xp[0]:
+        return fp[0]
+    if x >= xp[n - 1]:
+        return fp[n - 1]
+
+    j = 0
+    while xp[j + 1] <= x:
+        j += 1
+    slope = (fp[j + 1] - fp[j]) / (xp[j + 1] - xp[j])
+    return slope * (x - xp[j]) + fp[j]
+
+
+@_jit
+def _concentration(D, d, r, ratios, A, b):
+    D_over_d = D / d
+    return _interp(D_over_d, ratios, A) * (r / d) ** _interp(D_over_d, ratios, b)
+
+
+@_jit
+def _snap_index(sizes, d):
+    # index of the smallest size >= d (searchsorted, side="left")
+    i = 0
+    while i < sizes.size and sizes[i] < d:
+        i += 1
+    return i
+
+
+@_jit
+def _solve_discrete(V, M, T, link, r_ratio, Kt_min, Kts_min, Sy, target_fos, sizes,
+                    bend_ratios, bend_A, bend_b, tors_ratios, tors_A, tors_b,
+                    d, Kt, Kts, tol, max_outer_iter, max_iter):
+    """
+    shaftState.solve_discrete on the arrays d, Kt and Kts, in place.
+    Returns the number of outer passes or a status code.
+    """
+    n = d.size
+    guess = np.zeros(n)
+    dirty = np.zeros(n, dtype=np.bool_)
+    moved = np.zeros(n, dtype=np.bool_)
+    history = np.empty((max_outer_iter, n))
+    n_history = 0
+
+    for outer in range(max_outer_iter):
+
+        # --- continuous solve (shaftState.solve_iterative) ---
+        dirty[:] = True
+        for passes in range(max_iter):
+            change_max = 0.0
+            for i in range(n):
+                moved[i] = False
+                if not dirty[i]:
+                    continue
+                d_start = guess[i] if passes == 0 else d[i]
+                d_new = _bisect(0.0, V[i], M[i], T[i], Sy[i], Kt[i], Kts[i],
+                                target_fos[i], D_LOW, D_HIGH, d_start)
+                if math.isnan(d_new):
+                    return OUTSIDE_BRACKET
+                change = abs(d_new - d[i])
+                change_max = max(change_max, change)
+                moved[i] = change > 0
+                d[i] = d_new
+
+            # Kt/Kts of the shoulders next to a diameter that moved
+            any_dirty = False
+            for i in range(n):
+                dirty[i] = False
+                j = link[i]
+                if j < 0 or not (passes == 0 or moved[i] or moved[j]):
+                    continue
+
+                D = max(d[i], d[j])
+                d_small = min(d[i], d[j])
+                r = r_ratio[i] * d_small
+                kt = max(_concentration(D, d_small, r, bend_ratios, bend_A, bend_b),
+                            Kt_min[i])
+                kts = max(_concentration(D, d_small, r, tors_ratios, tors_A, tors_b),
+                            Kts_min[i])
+
+                if kt != Kt[i] or kts != Kts[i]:
+                    dirty[i] = True
+                    any_dirty = True
+                Kt[i] = kt
+                Kts[i] = kts
+
+            if change_max < tol or not any_dirty:
+                break
+
+        # --- snap, and warm-start the next pass from the continuous diameters ---
+        for i in range(n):
+            k = _snap_index(sizes, d[i])
+            if k == sizes.size:
+                return OUTSIDE_CATALOG
+            guess[i] = d[i]
+            d[i] = sizes[k]
+
+        # how many passes back the same snapped set was seen
+        back = 0
+        for k in range(1, n_history + 1):
+            same = True
+            for i in range(n):
+                if history[n_history - k, i] != d[i]:
+                    same = False
+                    break
+            if same:
+                back = k
+                break
+
+        if back == 1:
+            return outer + 1
+
+        if back > 1:
+            # snap cycle: keep the largest diameter of the cycle
+            for i in range(n):
+                for k in range(n_history - back, n_history):
+                    d[i] = max(d[i], history[k, i])
+            return outer + 1
+
+        history[n_history] = d
+        n_history += 1
+
+    return max_outer_iter
+
+
+@_jit
+def _snap_ring(V, M, T, Sy, Kt, Kts, target_fos, d_in, sizes, d_max):
+    """
+    (status, d, fos) of snapRingCalculation.solve_discrete_snap_ring.
+    """
+    d_required = _bisect(d_in, V, M, T, Sy, Kt, Kts, target_fos, d_in, d_max, 0.0)
+    if math.isnan(d_required):
+        return OUTSIDE_BRACKET, math.nan, math.nan
+
+    k = _snap_index(sizes, d_required)
+    while k < sizes.size:
+        fos = _fos(sizes[k], d_in, V, M, T, Sy, Kt, Kts)
+        if fos >= target_fos:
+            return 0, sizes[k], fos
+        k += 1
+
+    return OUTSIDE_CATALOG, math.nan, math.nan
+
+
+def _raise_for(status):
+    if status == OUTSIDE_BRACKET:
+        raise ValueError("A load case needs a diameter outside the solver bracket.")
+    if status == OUTSIDE_CATALOG:
+        raise ValueError("Required diameter exceeds available standard sizes.")
+
+
+# --- entry points ---
+
+def solve_discrete_kernel(state, Sy, target_fos, tol=1e-7, max_outer_iter=20, max_iter=50):
+    """
+    shaftState.solve_discrete through the kernel, in place. Works on
+    tiled states too; the kernel walks all segments like the NumPy
+    solver walks the arrays.
+    """
+    n = state.d.size
+    Sy = np.broadcast_to(np.asarray(Sy, dtype=float), n).copy()
+    target_fos = np.broadcast_to(np.asarray(target_fos, dtype=float), n).copy()
+
+    Kt_min = np.zeros(n) if state.Kt_min is None else state.Kt_min
+    Kts_min = np.zeros(n) if state.Kts_min is None else state.Kts_min
+
+    with instrumentation.stage("solve_discrete"):
+        status = _solve_discrete(
+            state.V, state.M, state.T, state.link, state.r_ratio, Kt_min, Kts_min,
+            Sy, target_fos, diameterSnap.catalog("norm"),
+            *StressConcentration.TABLES["bending"], *StressConcentration.TABLES["torsion"],
+            state.d, state.Kt, state.Kts, tol, max_outer_iter, max_iter
+        )
+    _raise_for(status)
+    return state
+
+
+def solve_discrete_snap_ring_kernel(V, M, T, Sy, Kt, Kts, target_fos, inner_diameter,
+                                    d_max=5.0):
+    status, d, fos = _snap_ring(float(V), float(M), float(T), float(Sy), float(Kt),
+                                float(Kts), float(target_fos), float(inner_diameter),
+                                diameterSnap.catalog("snapRing"), float(d_max))
+    _raise_for(status)
+    return float(d), float(fos)
+
+
+def _disable(err):
+    global ENABLED
+    ENABLED = False
+    warnings.warn(f"Compiled kernels disabled, using the NumPy solvers: {err}",
+                    RuntimeWarning, stacklevel=3)
+
+
+def solve_discrete(state, Sy, target_fos, tol=1e-7, max_outer_iter=20, max_iter=50,
+                    criterion="static", Sut=None):
+    """
+    shaftState.solve_discrete, compiled when ENABLED (static criterion
+    only; the fatigue criteria always run the NumPy solver).
+    """
+    if ENABLED and criterion == "static":
+        try:
+            return solve_discrete_kernel(state, Sy, target_fos, tol, max_outer_iter, max_iter)
+        except JIT_ERRORS as err:
+            _disable(err)
+    return shaftState.solve_discrete(state, Sy, target_fos, tol=tol,
+                                        max_outer_iter=max_outer_iter, max_iter=max_iter,
+                                        criterion=criterion, Sut=Sut)
+
+
+def solve_discrete_snap_ring(V, M, T, Sy, Kt, Kts, target_fos, inner_diameter):
+    """
+    snapRingCalculation.solve_discrete_snap_ring, compiled when ENABLED.
+    """
+    if ENABLED:
+        try:
+            return solve_discrete_snap_ring_kernel(V, M, T, Sy, Kt, Kts, target_fos,
+                                                    inner_diameter)
+        except JIT_ERRORS as err:
+            _disable(err)
+    return snapRingCalculation.solve_discrete_snap_ring(V, M, T, Sy, Kt, Kts,
+                                                        target_fos, inner_diameter)
+
+
+# --- kernel against NumPy ---
+
+@dataclass
+class CrossCheck:
+    n_segments: int
+    # snapped diameters that differ between the two paths
+    d_mismatches: int
+    # largest relative differences (Kt/Kts and FoS follow the
+    # continuous diameters, which agree to the bisection tolerance)
+    max_K_diff: float
+    max_fos_diff: float
+    n_snap_rings: int = 0
+    snap_ring_mismatches: int = 0
+    max_snap_ring_fos_diff: float = 0.0
+
+    @property
+    def ok(self):
+        return (self.d_mismatches == 0 and self.snap_ring_mismatches == 0
+                and max(self.max_K_diff, self.max_fos_diff,
+                        self.max_snap_ring_fos_diff) <= CHECK_RTOL)
+
+    def report(self):
+        return "\n".join([
+            f"segments     {self.n_segments:>8}   d mismatches {self.d_mismatches:>6}"
+            f"   max dK {self.max_K_diff:.2e}   max dFoS {self.max_fos_diff:.2e}",
+            f"snap rings   {self.n_snap_rings:>8}   d mismatches {self.snap_ring_mismatches:>6}"
+            f"   max dFoS {self.max_snap_ring_fos_diff:.2e}",
+            f"kernel and NumPy {'agree' if self.ok else 'DISAGREE'}"
+            f" ({'compiled' if HAVE_NUMBA else 'interpreted'} kernel)",
+        ])
+
+
+def _rel_diff(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if a.size == 0:
+        return 0.0
+    return float(np.max(np.abs(a - b) / np.maximum(np.abs(b), 1e-300)))
+
+
+def cross_check(state, Sy, target_fos, snap_rings=(), snap_ring_seats=(),
+                tol=1e-7, max_outer_iter=20):
+    """
+    Solves copies of state with the kernel and with
+    shaftState.solve_discrete, and the snap rings on the given segments
+    (seated on snap_ring_seats) with both snap ring solvers, and
+    compares the answers. Sy and target_fos are scalars or one value per
+    segment.
+    """
+    kernel = solve_discrete_kernel(state.copy(), Sy, target_fos, tol, max_outer_iter)
+    numpy = shaftState.solve_discrete(state.copy(), Sy, target_fos, tol=tol,
+                                        max_outer_iter=max_outer_iter)
+
+    def fos(s):
+        return DiameterCalculations.fos_calculation(s.V, s.M, s.T, Sy, s.Kt, s.Kts, s.d)
+
+    result = CrossCheck(
+        n_segments=state.d.size,
+        d_mismatches=int(np.count_nonzero(kernel.d != numpy.d)),
+        max_K_diff=max(_rel_diff(kernel.Kt, numpy.Kt), _rel_diff(kernel.Kts, numpy.Kts)),
+        max_fos_diff=_rel_diff(fos(kernel), fos(numpy)),
+    )
+
+    rings = np.asarray(snap_rings, dtype=np.intp)
+    seats = np.asarray(snap_ring_seats, dtype=np.intp)
+    if rings.size:
+        Sy_seg = np.broadcast_to(np.asarray(Sy, dtype=float), state.d.shape)
+        fos_seg = np.broadcast_to(np.asarray(target_fos, dtype=float), state.d.shape)
+
+        ring = [solve_discrete_snap_ring_kernel(
+                    kernel.V[i], kernel.M[i], kernel.T[i], Sy_seg[i],
+                    kernel.Kt[i], kernel.Kts[i], fos_seg[i], kernel.d[seat])
+                for i, seat in zip(rings, seats)]
+        d_numpy, fos_numpy = snapRingCalculation.solve_discrete_snap_ring_batch(
+            numpy.V[rings], numpy.M[rings], numpy.T[rings], Sy_seg[rings],
+            numpy.Kt[rings], numpy.Kts[rings], fos_seg[rings], numpy.d[seats]
+        )
+
+        result.n_snap_rings = rings.size
+        result.snap_ring_mismatches = int(np.count_nonzero(
+            np.array([d for d, _ in ring]) != d_numpy))
+        result.max_snap_ring_fos_diff = _rel_diff([f for _, f in ring], fos_numpy)
+
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shafts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import main
+    import batchDesign
+    import benchmarks
+
+    args = parse_args()
+    Sy = main.MATERIALS[0].Sy_psi
+    target_fos = main.TARGET_FOS_LIST[0]
+
+    batch = benchmarks.random_shaft_batch(args.shafts, args.seed)
+    state = batchDesign.batch_state(batch)
+    offsets = np.arange(args.shafts) * batchDesign.N_SEG
+    check = cross_check(state, Sy, target_fos,
+                        batchDesign.LAYOUT.snap_rings[0] + offsets,
+                        batchDesign.LAYOUT.snap_ring_seats[0] + offsets,
+                        tol=main.TOL, max_outer_iter=main.MAX_ITER)
+    print(check.report())
+
+    # per-shaft latency, one shaft per call
+    shafts = [batchDesign.batch_state({c: batch[c][k:k + 1] for c in batch})
+                for k in range(args.shafts)]
+    solve_discrete_kernel(shafts[0].copy(), Sy, target_fos)  # compile outside the timing
+
+    for label, solve in (("NumPy", shaftState.solve_discrete),
+                            ("kernel", solve_discrete_kernel)):
+        t0 = time.perf_counter()
+        for shaft in shafts:
+            solve(shaft.copy(), Sy, target_fos, main.TOL, main.MAX_ITER)
+        seconds = time.perf_counter() - t0
+        print(f"{label:<8} {seconds / args.shafts * 1e6:>10.1f} us per shaft")
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.optimize import minimize
+import catalogs
 
 STANDARD_KEYS = [
     (0.0625, 0.0625),      # 1/16" x 1/16"
@@ -39,6 +39,14 @@ STANDARD_KEYS = [
     (1.25, 1.25),          # 1 1/4" x 1 1/4"
 ]
 
+catalogs.register(
+    catalogs.from_columns("key", {
+        "w": [w for w, H in STANDARD_KEYS],
+        "H": [H for w, H in STANDARD_KEYS],
+    }, key=("w", "H")),
+    replace=False
+)
+
 
 
 def key_force_from_torque(T, d):
@@ -47,7 +55,8 @@ def key_force_from_torque(T, d):
 
 def key_von_mises(T, d, L, w, H):
 
-    F = key_force_from_torque(T, d)
+    # the stress magnitude does not depend on the sense of the torque
+    F = np.abs(key_force_from_torque(T, d))
 
     # --- Shear ---
     A_shear = L * w
@@ -59,63 +68,59 @@ def key_von_mises(T, d, L, w, H):
     sigma_bearing = F / A_bearing
     sigma_vm_bearing = sigma_bearing
 
-    return max(sigma_vm_shear, sigma_vm_bearing)
+    return np.maximum(sigma_vm_shear, sigma_vm_bearing)
 
 
 def optimize_key_length(T, d, w, h, Sy, target_fos, L_bounds):
+    """
+    Minimum key length for target_fos, clipped to L_bounds.
+    Closed form from required_key_length; T, d, w, h can be arrays.
+    """
     L_low, L_high = L_bounds
 
+    return np.clip(required_key_length(T, d, w, h, Sy, target_fos), L_low, L_high)
 
-    def fos(L):
-        sigma_vm = key_von_mises(T, d, L, w, h)
-        return Sy / sigma_vm
-
-    L_mid = 0
-
-    for _ in range(100):
-        L_mid = 0.5 * (L_low + L_high)
-        if fos(L_mid) > target_fos:
-            L_high = L_mid
-        else:
-            L_low = L_mid
 
-    return L_mid
 
-
-
-def optimize_key_height(T, d, L, w, Sy, target_fos):
+def optimize_key_height(T, d, L, w, Sy, target_fos, H_bounds=(0.01, 2.0)):
     """
     Solve for minimum key height H to meet target FoS.
-    """
 
-    def fos(H):
-        sigma_vm = key_von_mises(T, d, L, w, H)
-        return Sy / sigma_vm
-
-    H_low = 0.01
-    H_high = 2.0
-    H_mid = 0.0
+    Only the bearing stress 2F / (L H) depends on H, so
+        H = 2 F target_fos / (Sy L)
+    clipped to H_bounds. If the shear stress alone already misses the
+    target no height helps, and the upper bound is returned.
+    T, d, L, w can be arrays.
+    """
+    H_low, H_high = H_bounds
 
-    for _ in range(100):
-        H_mid = 0.5 * (H_low + H_high)
+    F = np.abs(key_force_from_torque(T, d))
 
-        if fos(H_mid) > target_fos:
-            H_high = H_mid
-        else:
-            H_low = H_mid
+    shear_fos = Sy * L * w / (np.sqrt(3) * F)
+    H_required = 2 * F * target_fos / (Sy * L)
 
-    return H_mid
+    return np.where(shear_fos > target_fos,
+                    np.clip(H_required, H_low, H_high),
+                    H_high)
 
 
 def snap_to_standard(required_w, required_H):
-    for w_std, H_std in STANDARD_KEYS:
-        if w_std >= required_w and H_std >= required_H:
-            return w_std, H_std
-    return STANDARD_KEYS[-1]  # fallback to largest
+    keys = catalogs.get("key")
+    fits = (keys["w"] >= required_w) & (keys["H"] >= required_H)
+    if not fits.any():
+        return float(keys["w"][-1]), float(keys["H"][-1])  # fallback to largest
+    i = np.argmax(fits)
+    return float(keys["w"][i]), float(keys["H"][i])
 
 
 def optimize_key_geometry(T, d, Sy, target_fos,
                             bounds_L, bounds_w, bounds_H):
+    """
+    Continuous L x w x H volume minimization (SLSQP). Not used by
+    discrete_key_design any more; kept for comparing against the
+    continuous optimum.
+    """
+    from scipy.optimize import minimize
 
     def objective(x):
         L, w, H = x
@@ -146,40 +151,86 @@ def optimize_key_geometry(T, d, Sy, target_fos,
     return result.x, result
 
 
+def required_key_length(T, d, w, H, Sy, target_fos):
+    """
+    Minimum key length for target_fos. Shear and bearing stress both
+    scale with F / L:
+        sigma_vm = F / L * max(sqrt(3) / w, 2 / H)
+    Works on scalars or arrays of w, H (and T, d).
+    """
+    F = np.abs(key_force_from_torque(T, d))
+    return target_fos * F * np.maximum(np.sqrt(3) / w, 2 / H) / Sy
+
+
 def discrete_key_design(T, d, Sy, target_fos,
                         bounds_L, bounds_w, bounds_H):
+    """
+    Picks the minimum-volume standard key. For every (w, H) in the key
+    catalog the minimum L comes from required_key_length (raised to
+    the lower length bound), keys outside the bounds are dropped, and
+    the smallest L * w * H wins.
+    """
+
+    keys = catalogs.get("key")
+    w, H = keys["w"], keys["H"]
 
+    L = np.maximum(required_key_length(T, d, w, H, Sy, target_fos), bounds_L[0])
 
-    solution, result = optimize_key_geometry(
-        T, d, Sy, target_fos,
-        bounds_L, bounds_w, bounds_H
+    feasible = (
+        (L <= bounds_L[1])
+        & (w >= bounds_w[0]) & (w <= bounds_w[1])
+        & (H >= bounds_H[0]) & (H <= bounds_H[1])
     )
 
-    if not result.success:
-        raise RuntimeError("Key optimization did not converge.")
+    if not feasible.any():
+        raise RuntimeError("No standard key meets the target FoS within the bounds.")
 
+    volume = np.where(feasible, L * w * H, np.inf)
+    i = np.argmin(volume)
 
-    L_cont, w_cont, H_cont = solution
+    L_required, w_snap, H_snap = float(L[i]), float(w[i]), float(H[i])
 
+    sigma_vm = key_von_mises(T, d, L_required, w_snap, H_snap)
+    fos = Sy / sigma_vm
 
-    w_snap, H_snap = snap_to_standard(w_cont, H_cont)
+    return L_required, w_snap, H_snap , fos
 
 
-    sigma_vm = key_von_mises(T, d, L_cont, w_snap, H_snap)
-    fos = Sy / sigma_vm
+def discrete_key_design_batch(T, d, Sy, target_fos,
+                                bounds_L, bounds_w, bounds_H):
+    """
+    Vectorized discrete_key_design over arrays of T, d, Sy and
+    target_fos (one row of the cases x catalog matrix per case).
+    Cases where no standard key fits get nan.
+    Returns (L, w, H, fos) arrays.
+    """
+    T, d, Sy, target_fos = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (T, d, Sy, target_fos))
+    )
 
-    # If snapping lowered FoS below target, increase length
-    if fos < target_fos:
-        L_required = optimize_key_length(
-            T, d, w_snap, H_snap, Sy, target_fos,
-            L_bounds=bounds_L
-        )
+    keys = catalogs.get("key")
+    w, H = keys["w"], keys["H"]
 
-    else:
-        L_required = L_cont
+    L = np.maximum(
+        required_key_length(T[..., None], d[..., None], w, H,
+                            Sy[..., None], target_fos[..., None]),
+        bounds_L[0]
+    )
 
-    sigma_vm = key_von_mises(T, d, L_required, w_snap, H_snap)
-    fos = Sy / sigma_vm
+    feasible = (
+        (L <= bounds_L[1])
+        & (w >= bounds_w[0]) & (w <= bounds_w[1])
+        & (H >= bounds_H[0]) & (H <= bounds_H[1])
+    )
 
-    return L_required, w_snap, H_snap , fos
+    volume = np.where(feasible, L * w * H, np.inf)
+    i = np.argmin(volume, axis=-1)
+    found = feasible.any(axis=-1)
+
+    L_best = np.where(found, np.take_along_axis(L, i[..., None], axis=-1)[..., 0], np.nan)
+    w_best = np.where(found, w[i], np.nan)
+    H_best = np.where(found, H[i], np.nan)
+
+    fos = Sy / key_von_mises(T, d, L_best, w_best, H_best)
 
+    return L_best, w_best, H_best, fos
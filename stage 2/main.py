@@ -1,17 +1,32 @@
 import DiameterCalculations
 import keywayCalculations
 import StressConcentration
-import snapRingCalculation
 import diameterSnap
+import shaftState
+import resultCache
+import instrumentation
+import kernels
+import radiusSearch
+import shaftLayout
 
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
-import copy
 
 MAX_ITER = 20
 TOL = 1e-7
 
+R_MIN = 0.02
+R_MAX = 0.10
+R_STEPS = 9
+RADIUS_METHODS = ("branch_and_bound", "coordinate")
+
+FOS_KEY_DIFF = 1.0
+
+KEY_BOUNDS_L = (0.5, 1.25)
+KEY_BOUNDS_W = (0.05, 0.5)
+KEY_BOUNDS_H = (0.05, 0.5)
+
 
 
 @dataclass
@@ -34,8 +49,9 @@ class Segment:
 
         D, d = max(self.d, linked_segment.d), min(self.d, linked_segment.d)
 
-        self.Kt = StressConcentration.stress_concentration(D, d, r, "bending")
-        self.Kts = StressConcentration.stress_concentration(D, d, r, "torsion")
+        # scalar lookup, repeated geometry in optimizer loops hits the cache
+        self.Kt = StressConcentration.cached_stress_concentration(D, d, r, "bending")
+        self.Kts = StressConcentration.cached_stress_concentration(D, d, r, "torsion")
 
         
 
@@ -44,207 +60,203 @@ class Segment:
 class Material:
     name: str
     Sy_psi: float
+    # ultimate strength, needed for the fatigue check
+    Sut_psi: Optional[float] = None
+    # lb / in^3 and $ / lb of bar stock, for mass and cost
+    density: float = 0.284
+    cost_per_lb: float = 1.50
 
 
-def solve_shaft_iterative(segments, Sy, target_fos, tol=1e-7, max_iter=50):
-
-    for _ in range(max_iter):
+TARGET_FOS_LIST = [2.0 ] #, 3.0]
+MATERIALS = [Material("4140 Steel", Sy_psi=60200, Sut_psi=95000)] # , Material("ALUMINIUM" , Sy_psi=43000)]
+KEY_MATERIALS = [Material("FILL IN NAME", Sy_psi=41300)]
 
-        max_change = 0
-
-        for seg in segments.values():
-
-            d_old = seg.d
-
-            seg.d = DiameterCalculations.solve_required_diameter(
-                seg.V, seg.M, seg.T,
-                Sy, seg.Kt, seg.Kts,
-                target_fos
-            )
 
-            max_change = max(max_change, abs(seg.d - d_old))
-
-        # Step 2 — update stress concentrations
-        for seg in segments.values():
-            if seg.link:
-                linked_seg = segments[seg.link]
-                d_small = min(seg.d, linked_seg.d)
-                r_actual = seg.r_ratio * d_small
-                seg.update_stress_concentration(linked_seg, r_actual)
+def solve_shaft_iterative(segments, Sy, target_fos, tol=1e-7, max_iter=50,
+                            criterion="static", Sut=None):
+    """
+    Works on a shaftState.ShaftState directly, or on a dict of
+    Segments (converted to arrays and written back).
+    """
 
-                
+    if isinstance(segments, shaftState.ShaftState):
+        return shaftState.solve_iterative(segments, Sy, target_fos, tol, max_iter,
+                                            criterion=criterion, Sut=Sut)
 
-        if max_change < tol:
-            # print("Converged.")
-            break
+    state = shaftState.ShaftState.from_segments(segments)
+    shaftState.solve_iterative(state, Sy, target_fos, tol, max_iter,
+                                criterion=criterion, Sut=Sut)
 
-    return segments
+    return state.to_segments(segments)
 
 def solve_shaft_discrete(segments, Sy, target_fos,
-                        tol=1e-7, max_outer_iter=20):
-
-    for _ in range(max_outer_iter):
-
-        segments = solve_shaft_iterative(
-            segments,
-            Sy,
-            target_fos,
-            tol,
-            max_outer_iter
-        )
-
+                        tol=1e-7, max_outer_iter=20, max_iter=50,
+                        criterion="static", Sut=None):
 
-        changed = diameterSnap.snap_all_diameters(segments , "norm")
+    if isinstance(segments, shaftState.ShaftState):
+        return kernels.solve_discrete(segments, Sy, target_fos, tol=tol,
+                                        max_outer_iter=max_outer_iter, max_iter=max_iter,
+                                        criterion=criterion, Sut=Sut)
 
+    state = shaftState.ShaftState.from_segments(segments)
+    kernels.solve_discrete(state, Sy, target_fos, tol=tol,
+                            max_outer_iter=max_outer_iter, max_iter=max_iter,
+                            criterion=criterion, Sut=Sut)
 
-        if not changed:
-            print("Discrete solution converged.")
-            break
+    return state.to_segments(segments)
 
-    return segments
-
-def build_segments():
+def layout_segments(layout):
+    """
+    Segment objects for a shaftLayout.CompiledLayout, keyed by name.
+    """
+    state = layout.state
     return {
-        "Output Spline Shoulder": Segment(
-            "Output Spline Shoulder",
-            97, 170, 462.5,
-            link="Bearing 1 Shoulder"
-        ),
-        "Bearing 1 Shoulder": Segment(
-            "Bearing 1 Shoulder",
-            176, 203, 462.5,
-            link="Center Section"
-        ),
-        "Center Section": Segment(
-            "Center Section",
-            176, 1254, 426.5
-        ),
-        "Gear Shoulder": Segment(
-            "Gear Shoulder",
-            176, 1254, 925,
-            link="Center Section"
-        ),
-        "Bearing 2 Shoulder": Segment(
-            "Bearing 2 Shoulder",
-            602, 300, -462.5,
-            link="Gear Shoulder"
-        ),
-        "Input Spline Shoulder": Segment(
-            "Input Spline Shoulder",
-            97, 170, -462.5,
-            link="Bearing 2 Shoulder"
-        ),
-        "Snap Ring" : Segment(
-            "Snap Ring" ,
-            602,995,-462.5,
-            Kt = 3,
-            Kts = 5 
-            )
-
+        name: Segment(
+            name,
+            float(state.V[i]), float(state.M[i]), float(state.T[i]),
+            link=state.names[state.link[i]] if state.link[i] >= 0 else "",
+            r_ratio=float(state.r_ratio[i]),
+            Kt=float(state.Kt[i]),
+            Kts=float(state.Kts[i])
+        )
+        for i, name in enumerate(state.names)
     }
 
+def build_segments(layout=None):
+    """
+    Segments of a layout, by default layouts/stage2_output_shaft.toml.
+    """
+    return layout_segments(layout or shaftLayout.default_layout())
+
 def optimize_radii(Sy, target_fos,
                     r_min=0.02,
                     r_max=0.10,
                     r_steps=9,
                     max_passes=5,
-                    initial_r=0.05):
+                    initial_r=0.05,
+                    method="branch_and_bound",
+                    layout=None):
     """
-    Coordinate-descent optimization of fillet radii.
+    Optimization of fillet radii for the smallest total diameter.
+
+    method="branch_and_bound" searches every combination of shoulder
+    radii on the grid, pruning with radiusSearch.branch_and_bound.
+    method="coordinate" is the older coordinate descent (one shoulder at
+    a time, at most max_passes sweeps starting from initial_r), which can
+    stop at a local minimum.
     Returns optimized segments dictionary.
     """
 
+    if method not in RADIUS_METHODS:
+        raise ValueError(f"method must be one of {RADIUS_METHODS}")
+
     r_values = np.linspace(r_min, r_max, r_steps)
 
-    segments = build_segments()
+    layout = layout or shaftLayout.default_layout()
+    state = layout.state.copy()
 
     # initialize radii
-    for seg in segments.values():
-        seg.r_ratio = initial_r
+    state.r_ratio[:] = initial_r
 
-    linked_names = [name for name, seg in segments.items() if seg.link]
+    linked = np.flatnonzero(state.link >= 0)
 
-    for outer_iter in range(max_passes):
-        radii_changed = False
-        for name in linked_names:
-        
-            local_best_r = segments[name].r_ratio
-            local_best_metric = float("inf")
-
-            for r_trial in r_values:
+    def total_diameter(radii):
+        trial = state.copy()
+        trial.r_ratio[linked] = radii
+        solve_shaft_discrete(trial, Sy, target_fos)
+        return trial.d.sum()
 
-                trial_segments = copy.deepcopy(segments)
+    with instrumentation.stage("optimize_radii"):
+        if method == "branch_and_bound":
+            best_radii, _, _ = radiusSearch.branch_and_bound(total_diameter, len(linked), r_values)
+            state.r_ratio[linked] = best_radii
+        else:
+            for outer_iter in range(max_passes):
+                radii_changed = False
+                for i in linked:
 
-                # copy current radii
-                for n in linked_names:
-                    trial_segments[n].r_ratio = segments[n].r_ratio
+                    local_best_r = state.r_ratio[i]
+                    local_best_metric = float("inf")
 
-                # vary only this shoulder
-                trial_segments[name].r_ratio = r_trial
+                    for r_trial in r_values:
 
-                trial_segments = solve_shaft_discrete(
-                    trial_segments,
-                    Sy,
-                    target_fos
-                )
+                        # fresh copy of the current radii, vary only this shoulder
+                        trial = state.copy()
+                        trial.r_ratio[i] = r_trial
 
-                total_d = sum(s.d for s in trial_segments.values())
+                        solve_shaft_discrete(trial, Sy, target_fos)
 
-                if total_d < local_best_metric:
-                    local_best_metric = total_d
-                    local_best_r = r_trial
+                        total_d = trial.d.sum()
 
-            if abs(segments[name].r_ratio - local_best_r) > 1e-6:
-                radii_changed = True
+                        if total_d < local_best_metric:
+                            local_best_metric = total_d
+                            local_best_r = r_trial
 
-            segments[name].r_ratio = local_best_r
+                    if abs(state.r_ratio[i] - local_best_r) > 1e-6:
+                        radii_changed = True
 
-        if not radii_changed:
+                    state.r_ratio[i] = local_best_r
 
-            break
+                if not radii_changed:
 
-    segments = solve_shaft_discrete(segments, Sy, target_fos)
+                    break
 
-    return segments
+    solve_shaft_discrete(state, Sy, target_fos)
 
-def main():
+    return state.to_segments(layout_segments(layout))
 
-    r_min = 0.02
-    r_max = 0.10
-    r_steps = 9
-
-
-    target_fos_list = [2.0 ] #, 3.0]
-    materials = [Material("4140 Steel", Sy_psi=60200)] # , Material("ALUMINIUM" , Sy_psi=43000)]
-    key_materials = [Material("FILL IN NAME", Sy_psi=41300)]
-    fos_key_diff = 1.0
+def design_shaft(Sy, target_fos, Sy_key, fos_key_diff=1.0, r_ratio=None,
+                    cache=None, Sut=None, layout=None, criterion="static"):
+    """
+    Full design for one material and design factor: shaft diameters,
+    snap rings and keys of a shaftLayout.CompiledLayout (default: the
+    Stage 2 shaft). If r_ratio is given it is used for every shoulder
+    fillet. If cache (a resultCache.ResultCache) is given the solves are
+    looked up there first. If Sut is given the shaft segments also get a
+    fatigue FoS (DE-Goodman, or the criterion's).
+    criterion "goodman" or "asme_elliptic" sizes the shaft segments for
+    that fatigue FoS as well as the static one (needs Sut); the snap
+    rings are still sized statically.
+    Returns a dict with the solved segments and the snap ring / key
+    results ("key" / "gear_d" are for the first keyway, None if the
+    layout has no keyway).
+    """
 
-    for target_fos in target_fos_list:
-        for material in materials:
+    layout = layout or shaftLayout.default_layout()
+    state = layout.state.copy()
 
-            Sy = material.Sy_psi
+    if r_ratio is not None:
+        state.r_ratio[:] = r_ratio
 
-            segments = build_segments()
-            # segments = optimize_radii(Sy, target_fos , r_min, r_max , r_steps, MAX_ITER)
+    # Sut only matters to the fatigue criteria; the snap ring grooves are
+    # sized by the snap ring solver below
+    Sut_shaft = None
+    if criterion != "static" and Sut is not None:
+        Sut_shaft = np.full(state.d.shape, float(Sut))
+        Sut_shaft[layout.snap_rings] = np.nan
 
-            segments = solve_shaft_discrete(segments, Sy, target_fos, TOL, MAX_ITER)
+    # segments = optimize_radii(Sy, target_fos , R_MIN, R_MAX , R_STEPS, MAX_ITER)
 
-            shaft_fos_values = []
-            for seg in segments.values():
-                seg.fos = DiameterCalculations.fos_calculation(
-                    seg.V, seg.M, seg.T,
-                    Sy, seg.Kt, seg.Kts, seg.d
-                )
-                shaft_fos_values.append(seg.fos)
+    with instrumentation.stage("shaft"):
+        state = resultCache.cached_call(
+            cache, solve_shaft_discrete,
+            state, Sy, target_fos, tol=TOL, max_outer_iter=MAX_ITER,
+            criterion=criterion, Sut=Sut_shaft
+        )
 
-            gear_d = segments["Gear Shoulder"].d
-            T_key = segments["Gear Shoulder"].T
+    state.fos = DiameterCalculations.fos_calculation(
+        state.V, state.M, state.T,
+        Sy, state.Kt, state.Kts, state.d
+    )
 
-            
-            
-            snapRing = segments["Snap Ring"]
+    segments = state.to_segments(layout_segments(layout))
 
-            snapRing.d, snapRing.fos = snapRingCalculation.solve_discrete_snap_ring(
+    snap_rings = {}
+    with instrumentation.stage("snap_ring"):
+        for i, seat in zip(layout.snap_rings, layout.snap_ring_seats):
+            snapRing = segments[state.names[i]]
+            snapRing.d, snapRing.fos = resultCache.cached_call(
+                cache, kernels.solve_discrete_snap_ring,
                 snapRing.V,
                 snapRing.M,
                 snapRing.T,
@@ -252,93 +264,149 @@ def main():
                 snapRing.Kt,
                 snapRing.Kts,
                 target_fos,
-                gear_d
+                float(state.d[seat])
             )
-            
-            shaft_fos_values.append(snapRing.fos)
-
-            min_shaft_fos = min(shaft_fos_values)
+            snap_rings[snapRing.name] = (snapRing.d, snapRing.fos, float(state.d[seat]))
 
-            Sy_key = key_materials[0].Sy_psi
-            
-            key_target_fos = min_shaft_fos - fos_key_diff
+    min_shaft_fos = min([float(state.fos.min())] + [fos for _, fos, _ in snap_rings.values()])
 
-            bounds_L = (0.5, 1.25)
-            bounds_w = (0.05, 0.5)
-            bounds_H = (0.05, 0.5)
+    key_target_fos = min_shaft_fos - fos_key_diff
 
-            L_opt, w_opt, H_opt, key_true_fos = keywayCalculations.discrete_key_design(
-                T_key, gear_d, Sy_key, key_target_fos,
-                bounds_L, bounds_w, bounds_H
+    keys = {}
+    with instrumentation.stage("key"):
+        for i in layout.keyways:
+            keys[state.names[i]] = resultCache.cached_call(
+                cache, keywayCalculations.discrete_key_design,
+                float(state.T[i]), float(state.d[i]), Sy_key, key_target_fos,
+                KEY_BOUNDS_L, KEY_BOUNDS_W, KEY_BOUNDS_H
             )
 
-            print("\n" + "="*100)
-            print("FINAL SHAFT DESIGN REPORT")
-            print("="*100)
+    key_segment = state.names[layout.keyways[0]] if layout.keyways.size else None
 
-            print(f"\nMaterial: {material.name}")
-            print(f"Yield Strength (Sy): {Sy:.2f} psi")
-            print(f"Design  Factor:    {target_fos:.4f}")
-            print("-"*100)
+    design = {
+        "segments": segments,
+        "gear_d": segments[key_segment].d if key_segment else None,
+        "min_shaft_fos": min_shaft_fos,
+        "key_target_fos": key_target_fos,
+        "key": keys[key_segment] if key_segment else None,
+        "keys": keys,
+        "snap_rings": snap_rings,
+    }
 
-            for seg in segments.values():
+    if Sut is not None:
+        fatigue_fos = shaftState.fatigue_fos(
+            state, Sut, Sy, "goodman" if criterion == "static" else criterion
+        )
+        design["fatigue_fos"] = {
+            name: float(fos) for name, fos in zip(state.names, fatigue_fos)
+            if name not in snap_rings
+        }
 
-                if seg.name == "Snap Ring":
-                    continue
+    return design
 
-                print(f"\nSEGMENT: {seg.name}")
-                print("-"*80)
+def print_report(material, target_fos, design):
 
-                print(f"Diameter (d):        {seg.d:.4f} in")
-                print(f"Kt (bending):        {seg.Kt:.4f}")
-                print(f"Kts (torsion):       {seg.Kts:.4f}")
-                print(f"True FoS:            {seg.fos:.4f}")
+    Sy = material.Sy_psi
+    segments = design["segments"]
+    snap_rings = design["snap_rings"]
+    min_shaft_fos = design["min_shaft_fos"]
+    key_target_fos = design["key_target_fos"]
 
-                if seg.link:
-                    linked = segments[seg.link]
+    print("\n" + "="*100)
+    print("FINAL SHAFT DESIGN REPORT")
+    print("="*100)
 
-                    D = max(seg.d, linked.d)
-                    d_small = min(seg.d, linked.d)
-                    r = seg.r_ratio * d_small
+    print(f"\nMaterial: {material.name}")
+    print(f"Yield Strength (Sy): {Sy:.2f} psi")
+    print(f"Design  Factor:    {target_fos:.4f}")
+    print("-"*100)
 
-                    print(f"Fillet Radius (r):   {r:.4f} in")
-                    print(f"d/D:                 {(D / d_small):.4f}")
-                    print(f"r/D:                 {(r / D):.4f}")
-                else:
-                    print(f"Fillet Radius:       N/A")
-                    print(f"D/d:                 N/A")
-                    print(f"r/D:                 N/A")
+    for seg in segments.values():
 
-            print("\n" + "="*100)
-            print("SNAP RING RESULTS")
-            print("="*100)
+        if seg.name in snap_rings:
+            continue
 
-            print(f"Snap Ring Outer Diameter:  {snapRing.d:.4f} in")
-            print(f"Snap Ring Inner Diameter:  {gear_d:.4f} in")
-            print(f"Snap Ring Kt:        {snapRing.Kt:.4f}")
-            print(f"Snap Ring Kts:       {snapRing.Kts:.4f}")
-            print(f"Snap Ring True FoS:  {snapRing.fos:.4f}")
+        print(f"\nSEGMENT: {seg.name}")
+        print("-"*80)
 
-            print("\nMinimum Governing FoS: "
-                f"{min_shaft_fos:.4f}")
+        print(f"Diameter (d):        {seg.d:.4f} in")
+        print(f"Kt (bending):        {seg.Kt:.4f}")
+        print(f"Kts (torsion):       {seg.Kts:.4f}")
+        print(f"True FoS:            {seg.fos:.4f}")
 
-            print("\n" + "="*100)
-            print("KEY DESIGN RESULTS")
-            print("="*100)
+        if "fatigue_fos" in design:
+            print(f"Fatigue FoS:         {design['fatigue_fos'][seg.name]:.4f}")
 
-            print(f"Gear Shaft Diameter: {gear_d:.4f} in")
-            print(f"Target Key FoS:      {key_target_fos:.4f}")
-            print(f"Key Length (L):      {L_opt:.4f} in")
-            print(f"Key Width (w):       {w_opt:.4f} in")
-            print(f"Key Height (H):      {H_opt:.4f} in")
-            print(f"True Key FoS:        {key_true_fos:.4f}")
+        if seg.link:
+            linked = segments[seg.link]
 
-            print("\n" + "="*100)
-            print("END OF REPORT")
-            print("="*100 + "\n")
+            D = max(seg.d, linked.d)
+            d_small = min(seg.d, linked.d)
+            r = seg.r_ratio * d_small
 
+            print(f"Fillet Radius (r):   {r:.4f} in")
+            print(f"d/D:                 {(D / d_small):.4f}")
+            print(f"r/D:                 {(r / D):.4f}")
+        else:
+            print(f"Fillet Radius:       N/A")
+            print(f"D/d:                 N/A")
+            print(f"r/D:                 N/A")
 
-if __name__ == "__main__":
-    main()
+    print("\n" + "="*100)
+    print("SNAP RING RESULTS")
+    print("="*100)
+
+    for name, (d_out, fos, d_in) in snap_rings.items():
+        snapRing = segments[name]
+
+        if len(snap_rings) > 1:
+            print(f"\nSNAP RING: {name}")
+
+        print(f"Snap Ring Outer Diameter:  {d_out:.4f} in")
+        print(f"Snap Ring Inner Diameter:  {d_in:.4f} in")
+        print(f"Snap Ring Kt:        {snapRing.Kt:.4f}")
+        print(f"Snap Ring Kts:       {snapRing.Kts:.4f}")
+        print(f"Snap Ring True FoS:  {fos:.4f}")
+
+    print("\nMinimum Governing FoS: "
+        f"{min_shaft_fos:.4f}")
 
+    if design["keys"]:
+        print("\n" + "="*100)
+        print("KEY DESIGN RESULTS")
+        print("="*100)
 
+    for name, (L_opt, w_opt, H_opt, key_true_fos) in design["keys"].items():
+
+        if len(design["keys"]) > 1:
+            print(f"\nKEYWAY: {name}")
+
+        print(f"Gear Shaft Diameter: {segments[name].d:.4f} in")
+        print(f"Target Key FoS:      {key_target_fos:.4f}")
+        print(f"Key Length (L):      {L_opt:.4f} in")
+        print(f"Key Width (w):       {w_opt:.4f} in")
+        print(f"Key Height (H):      {H_opt:.4f} in")
+        print(f"True Key FoS:        {key_true_fos:.4f}")
+
+    print("\n" + "="*100)
+    print("END OF REPORT")
+    print("="*100 + "\n")
+
+def main():
+
+    for target_fos in TARGET_FOS_LIST:
+        for material in MATERIALS:
+
+            design = design_shaft(
+                material.Sy_psi,
+                target_fos,
+                KEY_MATERIALS[0].Sy_psi,
+                FOS_KEY_DIFF,
+                Sut=material.Sut_psi
+            )
+
+            print_report(material, target_fos, design)
+
+
+if __name__ == "__main__":
+    main()
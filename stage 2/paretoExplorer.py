@@ -0,0 +1,485 @@
+"""
+Pareto explorer: shaft mass vs. minimum FoS vs. part cost.
+
+Every design is a material, a standard diameter for every shaft segment
+and a fillet ratio for every shoulder (plus the key and snap rings that
+go with them). Objectives:
+
+- mass: density * pi / 4 * d^2 * length over the segments,
+- min FoS: smallest static FoS of the segments and snap rings,
+- cost: bar stock (mass * $/lb) plus key stock.
+
+Keys are sized like design_shaft does: for a keyway diameter the only
+thing a key changes is cost (each catalog key gets the length that
+meets key_target_fos), so only the cheapest fitting key can be on the
+front and the other key sizes are pruned before the search. Snap rings
+are sized to target_fos on their seat; seat sizes without a ring are
+dropped.
+
+The search assigns the segments one at a time in link order (a shoulder
+after the segment it links to), on whole arrays of partial designs. A
+segment's FoS only depends on its own diameter and ratio and on the
+diameter it links to, so it is a lookup in a table built once per
+material. Partial designs are pruned when:
+
+- their FoS is already below fos_floor;
+- their optimistic completion (lightest/cheapest sizes and best FoS
+  still possible for the remaining segments) is dominated by a design
+  already in the archive;
+- another partial design with the same diameters on every segment that
+  a remaining shoulder links to dominates them. Both get the same
+  completions, so the dominated one can never reach the front.
+
+The complete designs go into a ParetoArchive that keeps only the
+non-dominated ones. Materials run one after the other against the same
+archive, so later materials are pruned by the front of earlier ones.
+
+Run from this folder:
+    python paretoExplorer.py --floor 1.5
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from typing import List
+import numpy as np
+
+import main
+import diameterSnap
+import DiameterCalculations
+import StressConcentration
+import keywayCalculations
+import snapRingCalculation
+import shaftLayout
+import instrumentation
+
+# partial designs compared against each other per block
+BLOCK = 1024
+
+
+def nondominated(F, group=None):
+    """
+    Mask of the rows of F (objectives to minimize, one per column) that
+    no other row in the same group weakly dominates. Of equal rows the
+    first one is kept.
+
+    Rows are sorted lexicographically, so a dominating row always comes
+    first; each block of rows is checked against the rows kept so far
+    in its groups and against the earlier rows of the block.
+    """
+    n = len(F)
+    group = np.zeros(n, dtype=np.int64) if group is None else group
+    order = np.lexsort(tuple(F[:, c] for c in reversed(range(F.shape[1]))) + (group,))
+    F_sorted, g_sorted = F[order], group[order]
+
+    keep = np.zeros(n, dtype=bool)
+    kept_F = np.empty((0, F.shape[1]))
+    kept_g = np.empty(0, dtype=np.int64)
+
+    for start in range(0, n, BLOCK):
+        Fb = F_sorted[start:start + BLOCK]
+        gb = g_sorted[start:start + BLOCK]
+
+        # kept rows are sorted by group; only the block's groups matter
+        lo = np.searchsorted(kept_g, gb[0])
+        Fk, gk = kept_F[lo:], kept_g[lo:]
+        dominated = np.any((gk[:, None] == gb[None, :])
+                            & np.all(Fk[:, None, :] <= Fb[None, :, :], axis=2), axis=0)
+
+        earlier = np.triu(np.ones((len(Fb), len(Fb)), dtype=bool), k=1)
+        dominated |= np.any(earlier & (gb[:, None] == gb[None, :])
+                            & np.all(Fb[:, None, :] <= Fb[None, :, :], axis=2), axis=0)
+
+        ok = ~dominated
+        keep[order[start:start + BLOCK][ok]] = True
+        kept_F = np.concatenate([kept_F, Fb[ok]])
+        kept_g = np.concatenate([kept_g, gb[ok]])
+
+    return keep
+
+
+class ParetoArchive:
+    """
+    Non-dominated set of points (objectives to minimize), each with an
+    integer payload row. Kept sorted on the first objective, so a
+    dominance query only looks at the points that are no worse on it.
+    """
+
+    def __init__(self, n_objectives, payload_width):
+        self.F = np.empty((0, n_objectives))
+        self.payload = np.empty((0, payload_width), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.F)
+
+    def dominates(self, Q):
+        """
+        Mask of the rows of Q weakly dominated by an archive point.
+        """
+        out = np.zeros(len(Q), dtype=bool)
+        if len(self.F) == 0:
+            return out
+
+        for start in range(0, len(Q), BLOCK):
+            Qb = Q[start:start + BLOCK]
+            prefix = self.F[:np.searchsorted(self.F[:, 0], Qb[:, 0].max(), side="right")]
+            out[start:start + BLOCK] = np.any(
+                np.all(prefix[:, None, :] <= Qb[None, :, :], axis=2), axis=0
+            )
+        return out
+
+    def add(self, F, payload):
+        """
+        Adds the non-dominated rows of F. Returns how many went in.
+        """
+        new = ~self.dominates(F)
+        F, payload = F[new], payload[new]
+        if len(F) == 0:
+            return 0
+
+        n_old = len(self.F)
+        F_all = np.concatenate([self.F, F])
+        payload_all = np.concatenate([self.payload, payload])
+
+        keep = nondominated(F_all)
+        order = np.flatnonzero(keep)
+        order = order[np.argsort(F_all[order, 0], kind="stable")]
+
+        self.F = F_all[order]
+        self.payload = payload_all[order]
+        return int(np.count_nonzero(keep[n_old:]))
+
+
+@dataclass
+class ExploreStats:
+    # size of the full design space
+    combinations: int = 0
+    # partial designs evaluated, and pruned by each rule
+    evaluated: int = 0
+    pruned_floor: int = 0
+    pruned_bound: int = 0
+    pruned_dominated: int = 0
+
+
+@dataclass
+class ParetoFront:
+    names: List[str]
+    materials: list
+    sizes: np.ndarray
+    r_values: np.ndarray
+    # columns: mass, cost, -min FoS
+    archive: ParetoArchive
+    # keyway segment -> (L, w, H) per size
+    keys: dict = field(default_factory=dict)
+    stats: ExploreStats = field(default_factory=ExploreStats)
+
+    @property
+    def mass(self):
+        return self.archive.F[:, 0]
+
+    @property
+    def cost(self):
+        return self.archive.F[:, 1]
+
+    @property
+    def min_fos(self):
+        return -self.archive.F[:, 2]
+
+    def designs(self):
+        """
+        The front as dicts, lightest first: material, d and r_ratio per
+        segment (r_ratio None where there is no shoulder), and the
+        (L, w, H) key per keyway segment.
+        """
+        index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+        out = []
+        for (mass, cost, neg_fos), row in zip(self.archive.F, self.archive.payload):
+            d_idx, r_idx = row[1:n + 1], row[n + 1:]
+            out.append({
+                "material": self.materials[row[0]].name,
+                "mass": float(mass),
+                "cost": float(cost),
+                "min_fos": float(-neg_fos),
+                "d": {name: float(self.sizes[k]) if k >= 0 else None
+                        for name, k in zip(self.names, d_idx)},
+                "r_ratio": {name: float(self.r_values[j]) if j >= 0 else None
+                            for name, j in zip(self.names, r_idx)},
+                "key": {name: tuple(float(x[d_idx[index[name]]]) for x in key)
+                        for name, key in self.keys.items()},
+            })
+        return out
+
+    def report(self):
+        lines = [f"{'mass':>8} {'cost':>8} {'min FoS':>8}  material / diameters"]
+        for design in self.designs():
+            d = " ".join(f"{v:.3f}" for v in design["d"].values() if v is not None)
+            lines.append(f"{design['mass']:>8.4f} {design['cost']:>8.3f} {design['min_fos']:>8.3f}"
+                            f"  {design['material']}: {d}")
+        s = self.stats
+        lines.append(f"{len(self.archive)} designs on the front; {s.combinations:,} combinations,"
+                        f" {s.evaluated:,} partial designs evaluated")
+        return "\n".join(lines)
+
+
+def link_order(link, variable):
+    """
+    The variable segments, each after the segment it links to.
+    Raises ValueError on a link cycle.
+    """
+    order, placed = [], set()
+    pending = [i for i in range(link.size) if variable[i]]
+    while pending:
+        ready = [i for i in pending if link[i] < 0 or link[i] in placed or not variable[link[i]]]
+        if not ready:
+            raise ValueError("Segment links form a cycle.")
+        order += ready
+        placed.update(ready)
+        pending = [i for i in pending if i not in placed]
+    return np.array(order, dtype=np.intp)
+
+
+def key_sizes(T, sizes, key_material, key_target_fos):
+    """
+    (L, w, H) of the cheapest (smallest) fitting key for every shaft
+    size, nan where no key fits.
+    """
+    L, w, H, _ = keywayCalculations.discrete_key_design_batch(
+        T, sizes, key_material.Sy_psi, key_target_fos,
+        main.KEY_BOUNDS_L, main.KEY_BOUNDS_W, main.KEY_BOUNDS_H
+    )
+    return L, w, H
+
+
+def ring_fos(state, i, Sy, target_fos, sizes):
+    """
+    FoS of the snap ring of segment i on every seat size (-inf if no
+    ring fits).
+    """
+    fos = np.full(sizes.size, -np.inf)
+    for k, d_seat in enumerate(sizes):
+        try:
+            _, fos[k] = snapRingCalculation.solve_discrete_snap_ring(
+                state.V[i], state.M[i], state.T[i], Sy,
+                state.Kt[i], state.Kts[i], target_fos, float(d_seat)
+            )
+        except ValueError:
+            pass
+    return fos
+
+
+def segment_tables(layout, material, sizes, r_values, lengths, target_fos,
+                    keys, key_material):
+    """
+    Per segment: FoS table (sizes, or sizes x link sizes x ratios for a
+    shoulder), mass and cost per size. Snap ring FoS goes into the
+    table of its seat, the cost of the key (keys: segment index ->
+    key_sizes) into the cost of the keyway segment.
+    """
+    state = layout.state
+    Sy = material.Sy_psi
+    n = len(layout)
+
+    fos, mass, cost = [None] * n, [None] * n, [None] * n
+
+    for i in range(n):
+        if state.link[i] >= 0:
+            d, d_link, r = np.meshgrid(sizes, sizes, r_values, indexing="ij")
+            D = np.maximum(d, d_link)
+            d_small = np.minimum(d, d_link)
+            Kt = StressConcentration.stress_concentration(D, d_small, r * d_small, "bending")
+            Kts = StressConcentration.stress_concentration(D, d_small, r * d_small, "torsion")
+            if state.Kt_min is not None:
+                Kt = np.maximum(Kt, state.Kt_min[i])
+                Kts = np.maximum(Kts, state.Kts_min[i])
+        else:
+            d, Kt, Kts = sizes, state.Kt[i], state.Kts[i]
+
+        fos[i] = DiameterCalculations.fos_calculation(
+            state.V[i], state.M[i], state.T[i], Sy, Kt, Kts, d
+        )
+        mass[i] = material.density * np.pi / 4 * lengths[i] * sizes**2
+        cost[i] = mass[i] * material.cost_per_lb
+
+    for i, seat in zip(layout.snap_rings, layout.snap_ring_seats):
+        ring = ring_fos(state, i, Sy, target_fos, sizes)
+        shape = (-1,) + (1,) * (fos[seat].ndim - 1)
+        fos[seat] = np.minimum(fos[seat], ring.reshape(shape))
+
+    for i, (L, w, H) in keys.items():
+        key_cost = L * w * H * key_material.density * key_material.cost_per_lb
+        cost[i] = cost[i] + np.where(np.isnan(key_cost), np.inf, key_cost)
+
+    return fos, mass, cost
+
+
+def explore(layout=None, materials=None, r_values=None, lengths=None, fos_floor=1.0,
+            target_fos=None, key_target_fos=None, key_material=None, archive=None):
+    """
+    Pareto front of (mass, cost, min FoS) over materials, standard
+    diameters and fillet ratios for a shaftLayout.CompiledLayout
+    (default: the Stage 2 shaft). Designs with a FoS under fos_floor
+    are left out. lengths default to the layout's segment lengths when
+    it gives them all, else to 1 in per segment (mass per inch).
+    Snap ring segments are not variables: their rings are sized to
+    target_fos on the seat. Keys are sized to key_target_fos.
+
+    Returns a ParetoFront. Passing the archive of an earlier run (same
+    layout and grids) adds to it.
+    """
+    layout = layout or shaftLayout.default_layout()
+    materials = list(materials or main.MATERIALS)
+    r_values = np.asarray(
+        np.linspace(main.R_MIN, main.R_MAX, main.R_STEPS) if r_values is None else r_values,
+        dtype=float
+    )
+    target_fos = main.TARGET_FOS_LIST[0] if target_fos is None else target_fos
+    if key_target_fos is None:
+        key_target_fos = target_fos - main.FOS_KEY_DIFF
+    key_material = key_material or main.KEY_MATERIALS[0]
+
+    n = len(layout)
+    if lengths is None:
+        lengths = layout.segment_lengths()
+    lengths = np.broadcast_to(np.asarray(1.0 if lengths is None else lengths, dtype=float), (n,))
+    sizes = np.asarray(diameterSnap.catalog("norm"), dtype=float)
+    n_d = sizes.size
+
+    state = layout.state
+    variable = np.ones(n, dtype=bool)
+    variable[layout.snap_rings] = False
+    order = link_order(state.link, variable)
+    linked = state.link >= 0
+
+    # payload: material, d index per segment, r index per segment
+    archive = archive or ParetoArchive(3, 1 + 2 * n)
+    stats = ExploreStats()
+
+    keys = {int(i): key_sizes(state.T[i], sizes, key_material, key_target_fos)
+            for i in layout.keyways}
+
+    choices = [n_d * (r_values.size if linked[i] else 1) for i in order]
+    stats.combinations = len(materials) * int(np.prod(choices, dtype=object))
+
+    with instrumentation.stage("explore"):
+        for m, material in enumerate(materials):
+            fos_table, mass_table, cost_table = segment_tables(
+                layout, material, sizes, r_values, lengths, target_fos,
+                keys, key_material
+            )
+            _search(layout, order, m, fos_table, mass_table, cost_table,
+                    fos_floor, archive, stats)
+
+    instrumentation.count("pareto.evaluated", stats.evaluated)
+    return ParetoFront(list(state.names), materials, sizes, r_values, archive,
+                        {state.names[i]: key for i, key in keys.items()}, stats)
+
+
+def _search(layout, order, m, fos_table, mass_table, cost_table, fos_floor, archive, stats):
+    link = layout.state.link
+    n = len(layout)
+    n_d = mass_table[order[0]].size
+
+    # best case of every segment on its own
+    best_fos = np.array([fos_table[i].max() for i in order])
+    usable = [
+        (fos_table[i] if fos_table[i].ndim == 1 else fos_table[i].max(axis=(1, 2))) >= fos_floor
+        for i in order
+    ]
+    if not all(u.any() for u in usable):
+        return
+
+    least_mass = np.array([mass_table[i][u].min() for i, u in zip(order, usable)])
+    least_cost = np.array([cost_table[i][u].min() for i, u in zip(order, usable)])
+
+    # bounds on the segments after level t
+    rest_mass = np.r_[np.cumsum(least_mass[::-1])[::-1], 0.0]
+    rest_cost = np.r_[np.cumsum(least_cost[::-1])[::-1], 0.0]
+    rest_fos = np.r_[np.minimum.accumulate(best_fos[::-1])[::-1], np.inf]
+
+    d_idx = np.full((1, n), -1, dtype=np.int64)
+    r_idx = np.full((1, n), -1, dtype=np.int64)
+    mass = np.zeros(1)
+    cost = np.zeros(1)
+    fos = np.full(1, np.inf)
+
+    for t, i in enumerate(order):
+        table = fos_table[i]
+        k_opts = np.flatnonzero(usable[t])
+
+        if table.ndim == 1:
+            k = np.tile(k_opts, len(mass))
+            rows = np.repeat(np.arange(len(mass)), k_opts.size)
+            j = np.full(k.size, -1)
+            fos_i = table[k]
+        else:
+            n_r = table.shape[2]
+            kk, jj = np.meshgrid(k_opts, np.arange(n_r), indexing="ij")
+            k = np.tile(kk.ravel(), len(mass))
+            j = np.tile(jj.ravel(), len(mass))
+            rows = np.repeat(np.arange(len(mass)), kk.size)
+            fos_i = table[k, d_idx[rows, link[i]], j]
+
+        new_fos = np.minimum(fos[rows], fos_i)
+        stats.evaluated += rows.size
+
+        ok = new_fos >= fos_floor
+        stats.pruned_floor += int(np.count_nonzero(~ok))
+        rows, k, j, new_fos = rows[ok], k[ok], j[ok], new_fos[ok]
+
+        new_mass = mass[rows] + mass_table[i][k]
+        new_cost = cost[rows] + cost_table[i][k]
+
+        bound = np.column_stack([new_mass + rest_mass[t + 1],
+                                    new_cost + rest_cost[t + 1],
+                                    -np.minimum(new_fos, rest_fos[t + 1])])
+        ok = ~archive.dominates(bound)
+        stats.pruned_bound += int(np.count_nonzero(~ok))
+        rows, k, j = rows[ok], k[ok], j[ok]
+        new_mass, new_cost, new_fos = new_mass[ok], new_cost[ok], new_fos[ok]
+
+        d_idx = d_idx[rows]
+        r_idx = r_idx[rows]
+        d_idx[:, i] = k
+        r_idx[:, i] = j
+
+        # assigned diameters the remaining shoulders link to
+        later = order[t + 1:]
+        interface = np.intersect1d(link[later], order[:t + 1])
+        if interface.size:
+            group = np.ravel_multi_index(tuple(d_idx[:, s] for s in interface),
+                                            (n_d,) * interface.size)
+        else:
+            group = np.zeros(len(rows), dtype=np.int64)
+
+        F = np.column_stack([new_mass, new_cost, -new_fos])
+        ok = nondominated(F, group)
+        stats.pruned_dominated += int(np.count_nonzero(~ok))
+
+        d_idx, r_idx = d_idx[ok], r_idx[ok]
+        mass, cost, fos = new_mass[ok], new_cost[ok], new_fos[ok]
+
+        if len(mass) == 0:
+            return
+
+    payload = np.column_stack([np.full(len(mass), m), d_idx, r_idx])
+    archive.add(np.column_stack([mass, cost, -fos]), payload)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", default=None, help="layout file (default: Stage 2 shaft)")
+    parser.add_argument("--floor", type=float, default=1.0, help="smallest FoS worth keeping")
+    parser.add_argument("--r-steps", type=int, default=main.R_STEPS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    layout = (shaftLayout.load_layout(args.layout) if args.layout
+                else shaftLayout.default_layout())
+
+    # mass per inch unless the layout gives every segment a length
+    front = explore(layout, r_values=np.linspace(main.R_MIN, main.R_MAX, args.r_steps),
+                    fos_floor=args.floor)
+    print(front.report())
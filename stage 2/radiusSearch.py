@@ -0,0 +1,105 @@
+"""
+Global search over the shoulder fillet radii.
+
+Every shoulder takes one of the radius ratios in a grid, so the search
+space is values ** n_shoulders combinations (9**5 = 59049 for the
+default grid) and each combination costs a full discrete shaft solve.
+
+branch_and_bound relies on monotonicity: a larger fillet radius lowers
+Kt/Kts, so the required diameters (and their snapped sizes) never go up
+when a ratio goes up. Then:
+
+- the combination with every shoulder at the largest ratio reaches the
+  minimum total diameter. Its total is the bound.
+- a partial choice is worth branching into only if its optimistic
+  completion (undecided shoulders at the largest ratio) still reaches
+  the bound. Every other branch is pruned.
+- if the pessimistic completion (undecided shoulders at the smallest
+  ratio) reaches the bound too, the rest of the subtree is settled.
+
+Among the combinations that reach the minimum the search returns the
+one with the smallest radii, shoulder by shoulder. The shoulders are
+fixed in order; for each one, the optimistic totals are monotone in its
+ratio, so the smallest ratio that keeps the bound is found by bisection
+over the grid. That is about n_shoulders * log2(len(values)) solves
+instead of len(values) ** n_shoulders, and since the diameters snap to
+a handful of catalog sizes most shoulders settle early.
+
+The monotonicity is not proven for the snapped sizes (snapping and the
+snap cycle rule could break it); exhaustive is the brute-force
+reference that benchmarks.py checks branch_and_bound against.
+"""
+
+import itertools
+import numpy as np
+
+import instrumentation
+
+
+def branch_and_bound(evaluate, n_vars, values, tol=1e-9):
+    """
+    Minimizes evaluate(combo) over every tuple combo of n_vars entries
+    from values (sorted ascending), assuming evaluate is nonincreasing
+    in each entry. Ties go to the lexicographically smallest combo, i.e.
+    the smallest radii that reach the minimum.
+
+    Returns (best_combo, best_value, n_evaluations).
+    """
+    values = [float(v) for v in values]
+    low, high = values[0], values[-1]
+
+    memo = {}
+
+    def value(combo):
+        if combo not in memo:
+            instrumentation.count("radius_evaluations")
+            memo[combo] = evaluate(combo)
+        return memo[combo]
+
+    bound = value((high,) * n_vars)
+
+    def reaches_bound(combo):
+        return value(combo) <= bound + tol
+
+    prefix = ()
+    while len(prefix) < n_vars:
+        rest = n_vars - len(prefix) - 1
+
+        # settled: the smallest ratios from here on still reach the bound
+        if reaches_bound(prefix + (low,) * (rest + 1)):
+            prefix += (low,) * (rest + 1)
+            break
+
+        # smallest ratio for this shoulder whose optimistic completion
+        # reaches the bound; values[-1] always does
+        i_low, i_high = 0, len(values) - 1
+        while i_low < i_high:
+            mid = (i_low + i_high) // 2
+            if reaches_bound(prefix + (values[mid],) + (high,) * rest):
+                i_high = mid
+            else:
+                # this ratio and every smaller one are pruned
+                instrumentation.count("radius_pruned", mid + 1 - i_low)
+                i_low = mid + 1
+
+        prefix += (values[i_high],)
+
+    return prefix, value(prefix), len(memo)
+
+
+def exhaustive(evaluate_batch, n_vars, values, tol=1e-9):
+    """
+    Brute-force reference for branch_and_bound. evaluate_batch gets
+    every combo at once, an array of shape (len(values) ** n_vars,
+    n_vars) in lexicographic order, and returns their values. Ties go to
+    the lexicographically smallest combo, as in branch_and_bound.
+
+    Returns (best_combo, best_value, n_evaluations).
+    """
+    values = np.asarray(values, dtype=float)
+    combos = np.array(list(itertools.product(values, repeat=n_vars)))
+
+    totals = np.asarray(evaluate_batch(combos), dtype=float)
+    best = int(np.argmax(totals <= totals.min() + tol))
+
+    return tuple(float(v) for v in combos[best]), float(totals[best]), len(combos)
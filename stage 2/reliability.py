@@ -0,0 +1,196 @@
+"""
+Monte Carlo reliability of the shaft sections.
+
+Samples the loads (V, M, T), the yield strength and the stress
+concentration factors around their nominal values, evaluates the
+vectorized von Mises FoS (DiameterCalculations.fos_calculation) for
+every sample and counts the samples with FoS < 1.
+
+Samples are drawn in chunks of chunk_size, so memory stays bounded
+however many samples are asked for. Every chunk has its own random
+stream spawned from one SeedSequence, so a given seed gives the same
+counts whether the chunks run in one process or on a pool.
+
+Run from this folder:
+    python reliability.py --samples 10000000 --workers 8
+"""
+
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import List
+import numpy as np
+
+import DiameterCalculations
+
+DEFAULT_CHUNK = 50_000
+
+
+@dataclass
+class Scatter:
+    """
+    Coefficients of variation (std / mean). Loads are normal, Sy and
+    Kt/Kts lognormal. Kt and Kts share one draw per sample since they
+    come from the same fillet geometry.
+    """
+    V: float = 0.10
+    M: float = 0.10
+    T: float = 0.10
+    Sy: float = 0.08
+    Kt: float = 0.05
+
+
+@dataclass
+class ReliabilityResult:
+    names: List[str]
+    n_samples: int
+    failures: np.ndarray
+    p_fail: np.ndarray
+    ci_low: np.ndarray
+    ci_high: np.ndarray
+    confidence: float
+
+    def report(self):
+        lines = [f"{'Segment':<24} {'P(fail)':>12}   {self.confidence:.0%} interval"]
+        for i, name in enumerate(self.names):
+            lines.append(f"{name:<24} {self.p_fail[i]:>12.3e}   "
+                            f"[{self.ci_low[i]:.3e}, {self.ci_high[i]:.3e}]")
+        return "\n".join(lines)
+
+
+def wilson_interval(failures, n, confidence=0.95):
+    """
+    Wilson score interval for a binomial proportion; stays inside
+    [0, 1] and is sensible when no failures were seen.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = np.asarray(failures, dtype=float) / n
+
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    low = np.where(p > 0, np.maximum(center - half, 0.0), 0.0)
+    return low, np.minimum(center + half, 1.0)
+
+
+def _normal(rng, mean, cov, shape):
+    return mean + cov * np.abs(mean) * rng.standard_normal(shape)
+
+
+def _lognormal(rng, mean, cov, shape):
+    sigma = math.sqrt(math.log1p(cov**2))
+    return mean * np.exp(sigma * rng.standard_normal(shape) - sigma**2 / 2)
+
+
+def count_failures(nominal, scatter, chunk_sizes, seeds):
+    """
+    Failures per section over the given chunks. nominal holds arrays
+    (one value per section) for V, M, T, Sy, Kt, Kts and d.
+    """
+    n_sections = nominal["d"].size
+    failures = np.zeros(n_sections, dtype=np.int64)
+
+    for size, seed in zip(chunk_sizes, seeds):
+        rng = np.random.default_rng(seed)
+        shape = (size, n_sections)
+
+        V = _normal(rng, nominal["V"], scatter.V, shape)
+        M = _normal(rng, nominal["M"], scatter.M, shape)
+        T = _normal(rng, nominal["T"], scatter.T, shape)
+        Sy = _lognormal(rng, nominal["Sy"], scatter.Sy, shape)
+
+        k = _lognormal(rng, 1.0, scatter.Kt, shape)
+        Kt = nominal["Kt"] * k
+        Kts = nominal["Kts"] * k
+
+        fos = DiameterCalculations.fos_calculation(V, M, T, Sy, Kt, Kts, nominal["d"])
+        failures += np.count_nonzero(fos < 1.0, axis=0)
+
+    return failures
+
+
+def failure_probability(V, M, T, Sy, Kt, Kts, d, scatter=None, n_samples=1_000_000,
+                        seed=0, chunk_size=DEFAULT_CHUNK, max_workers=None,
+                        confidence=0.95, names=None):
+    """
+    Probability of yielding (FoS < 1) for each section, with a Wilson
+    confidence interval. Inputs are per-section nominal values (scalars
+    broadcast). max_workers > 1 spreads the chunks over a process pool.
+    Raises ValueError unless n_samples and chunk_size are positive.
+    """
+    if n_samples <= 0 or chunk_size <= 0:
+        raise ValueError("n_samples and chunk_size must be positive.")
+
+    scatter = scatter or Scatter()
+
+    V, M, T, Sy, Kt, Kts, d = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (V, M, T, Sy, Kt, Kts, d))
+    )
+    nominal = {"V": V, "M": M, "T": T, "Sy": Sy, "Kt": Kt, "Kts": Kts, "d": d}
+
+    n_chunks = -(-n_samples // chunk_size)
+    chunk_sizes = [chunk_size] * (n_chunks - 1) + [n_samples - chunk_size * (n_chunks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    if max_workers and max_workers > 1 and n_chunks > 1:
+        workers = min(max_workers, n_chunks)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(count_failures, nominal, scatter,
+                            chunk_sizes[i::workers], seeds[i::workers])
+                for i in range(workers)
+            ]
+            failures = sum(future.result() for future in futures)
+    else:
+        failures = count_failures(nominal, scatter, chunk_sizes, seeds)
+
+    ci_low, ci_high = wilson_interval(failures, n_samples, confidence)
+
+    return ReliabilityResult(
+        names=list(names) if names is not None else [str(i) for i in range(d.size)],
+        n_samples=n_samples,
+        failures=failures,
+        p_fail=failures / n_samples,
+        ci_low=ci_low,
+        ci_high=ci_high,
+        confidence=confidence,
+    )
+
+
+def state_reliability(state, Sy, scatter=None, **kwargs):
+    """
+    failure_probability for every segment of a solved
+    shaftState.ShaftState. Every segment is checked as a solid section
+    of its diameter.
+    """
+    return failure_probability(state.V, state.M, state.T, Sy, state.Kt, state.Kts,
+                                state.d, scatter, names=state.names, **kwargs)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import main
+    import shaftState
+
+    args = parse_args()
+    material = main.MATERIALS[0]
+
+    state = shaftState.ShaftState.from_segments(main.build_segments())
+    shaftState.solve_discrete(state, material.Sy_psi, main.TARGET_FOS_LIST[0],
+                                tol=main.TOL, max_outer_iter=main.MAX_ITER)
+
+    result = state_reliability(state, material.Sy_psi, n_samples=args.samples,
+                                seed=args.seed, chunk_size=args.chunk_size,
+                                max_workers=args.workers, confidence=args.confidence)
+    print(result.report())
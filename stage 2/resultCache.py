@@ -0,0 +1,161 @@
+"""
+Persistent result cache for the design solvers.
+
+Results are stored in a local SQLite file, keyed on a SHA-256 of the
+function name, its arguments (loads, Sy, target FoS, r_ratio, solver
+settings...), CACHE_VERSION and the catalogs in use. Re-running a sweep
+only computes the points that are not in the file yet. The least
+recently used entries are evicted once the file holds more than
+max_entries results.
+
+Usage:
+    cache = ResultCache("results.sqlite")
+    segments = cached_call(cache, main.solve_shaft_discrete, segments, Sy, target_fos)
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+import numpy as np
+
+import catalogs
+
+# bump when a solver change makes old results wrong
+CACHE_VERSION = 2
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results_cache.sqlite")
+
+
+def _canonical(value):
+    """
+    JSON-friendly form of an argument. Floats are written with
+    float.hex so equal inputs always hash the same.
+    """
+    if isinstance(value, (bool, str, type(None))):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value).hex()
+    if isinstance(value, np.ndarray):
+        return [str(value.dtype), list(value.shape), [_canonical(v) for v in value.ravel().tolist()]]
+    if dataclasses.is_dataclass(value):
+        return [type(value).__name__,
+                {f.name: _canonical(getattr(value, f.name)) for f in dataclasses.fields(value)}]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    raise TypeError(f"Can't build a cache key from {type(value).__name__}")
+
+
+def input_key(name, args, kwargs):
+    payload = {
+        "version": CACHE_VERSION,
+        "function": name,
+        "args": _canonical(list(args)),
+        "kwargs": _canonical(kwargs),
+        "catalogs": {c: catalogs.fingerprint(c) for c in ("shaft", "snapRing", "key")},
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # several sweep workers may share the file
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        """
+        Cached value or None. Marks the entry as recently used.
+        """
+        row = self.conn.execute(
+            "SELECT value FROM results WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        with self.conn:
+            self.conn.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        extra = count - self.max_entries
+        if extra > 0:
+            self.conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                (extra,)
+            )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM results")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cached_call(cache, func, *args, **kwargs):
+    """
+    func(*args, **kwargs) through the cache. With cache=None this is
+    just the call.
+    """
+    if cache is None:
+        return func(*args, **kwargs)
+
+    # module file name rather than __module__, which is "__main__" when
+    # main.py is run as a script
+    module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+    key = input_key(f"{module}.{func.__qualname__}", args, kwargs)
+
+    value = cache.get(key)
+    if value is None:
+        value = func(*args, **kwargs)
+        cache.put(key, value)
+    return value
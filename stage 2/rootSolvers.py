@@ -0,0 +1,232 @@
+"""
+Root finding for the diameter sizing problems.
+
+Each solver looks for the diameter d in [d_low, d_high] where
+fos(d) == target_fos. The FoS goes up with d, so the root is unique
+when the bracket contains it.
+
+Methods:
+- "bisection": the original fixed bracket halving
+- "newton":    Newton with the analytic dFoS/dd, kept inside the bracket
+- "brent":     scipy's brentq
+- "cubic":     Newton started from a closed-form cubic-root estimate
+"""
+
+import numpy as np
+
+import instrumentation
+
+SOLVER_METHODS = ("bisection", "newton", "brent", "cubic")
+
+# relative half-width of the bracket around a warm-start guess
+WARM_WIDTH = 0.02
+
+
+def safe_fos(fos_func, d):
+    """
+    Evaluates fos_func as a numpy float so a zero-area section (the
+    snap ring at d_out == d_in) gives FoS = 0 instead of raising
+    ZeroDivisionError or returning nan.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fos = fos_func(np.float64(d))
+    return 0.0 if np.isnan(fos) else fos
+
+
+def check_bracket(fos_func, target_fos, d_low, d_high):
+    """
+    Raises ValueError if the target FoS is not reached inside
+    [d_low, d_high].
+    """
+    fos_low = safe_fos(fos_func, d_low)
+    fos_high = safe_fos(fos_func, d_high)
+
+    if fos_high < target_fos:
+        raise ValueError(
+            f"Required diameter is above the solver bracket: "
+            f"FoS at d = {d_high} in is {fos_high:.4f} < {target_fos}."
+        )
+    if fos_low > target_fos:
+        raise ValueError(
+            f"Required diameter is below the solver bracket: "
+            f"FoS at d = {d_low} in is {fos_low:.4f} > {target_fos}."
+        )
+
+
+def bisection(fos_func, target_fos, d_low, d_high, tol=1e-5, max_iter=100):
+    d_mid = 0
+    iterations = 0
+
+    for iterations in range(1, max_iter + 1):
+        d_mid = 0.5 * (d_low + d_high)
+        fos = fos_func(d_mid)
+
+        if abs(fos - target_fos) < tol:
+            break
+
+        if fos > target_fos:
+            d_high = d_mid
+        else:
+            d_low = d_mid
+
+    instrumentation.count("bisection_iterations", iterations)
+    return d_mid, iterations
+
+
+def newton(fos_func, dfos_func, target_fos, d_low, d_high,
+            tol=1e-5, max_iter=100, d_start=None):
+    """
+    Newton iteration on fos(d) - target_fos. The bracket is shrunk on
+    every step and a bisection step is taken whenever Newton would
+    leave it, so this never does worse than bisection.
+    """
+    if d_start is None or not d_low < d_start < d_high:
+        d_start = 0.5 * (d_low + d_high)
+
+    d = d_start
+    iterations = 0
+
+    for iterations in range(1, max_iter + 1):
+        err = fos_func(d) - target_fos
+
+        if abs(err) < tol:
+            break
+
+        if err > 0:
+            d_high = d
+        else:
+            d_low = d
+
+        slope = dfos_func(d)
+        d_next = d - err / slope if slope > 0 else d_low
+
+        if not d_low < d_next < d_high:
+            d_next = 0.5 * (d_low + d_high)
+
+        d = d_next
+
+    instrumentation.count("newton_iterations", iterations)
+    return float(d), iterations
+
+
+def brent(fos_func, target_fos, d_low, d_high, max_iter=100):
+    from scipy.optimize import brentq
+
+    def residual(d):
+        return safe_fos(fos_func, d) - target_fos
+
+    d, result = brentq(residual, d_low, d_high,
+                        xtol=1e-12, maxiter=max_iter, full_output=True)
+    instrumentation.count("brent_iterations", result.iterations)
+    return d, result.iterations
+
+
+def warm_bracket(fos_func, params, target_fos, d_low, d_high, d_guess,
+                    rel_width=WARM_WIDTH):
+    """
+    Narrows [d_low, d_high] to d_guess * (1 -/+ rel_width) for the cases
+    whose root is inside that window; the others keep the full bracket.
+    Returns (d_low, d_high, fos_low, fos_high) so the bracket ends are
+    not evaluated twice.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        near_low = np.maximum(d_guess * (1 - rel_width), d_low)
+        near_high = np.minimum(d_guess * (1 + rel_width), d_high)
+        fos_low = np.nan_to_num(fos_func(near_low, *params), nan=0.0)
+        fos_high = fos_func(near_high, *params)
+
+        hit = (fos_low <= target_fos) & (fos_high >= target_fos)
+        miss = ~hit
+
+        if miss.any():
+            instrumentation.count("warm_bracket_misses", np.count_nonzero(miss))
+            miss_params = tuple(p[miss] for p in params)
+            fos_low[miss] = np.nan_to_num(fos_func(d_low[miss], *miss_params), nan=0.0)
+            fos_high[miss] = fos_func(d_high[miss], *miss_params)
+
+    return (np.where(hit, near_low, d_low), np.where(hit, near_high, d_high),
+            fos_low, fos_high)
+
+
+def bisection_batch(fos_func, params, target_fos, d_low, d_high,
+                    tol=1e-5, max_iter=100, d_guess=None):
+    """
+    Vectorized bisection over many cases at once.
+
+    fos_func(d, *params) is evaluated on flat arrays; params is a tuple
+    of flat per-case arrays, and target_fos, d_low and d_high are flat
+    arrays of the same length. Each case follows the same steps as
+    bisection() and stops updating once its FoS is within tol; cases
+    are dropped from the working set as they converge.
+
+    With d_guess (e.g. the diameters of the previous solver pass) each
+    case starts from a narrow bracket around its guess when the root is
+    inside it (see warm_bracket), which saves most of the halvings.
+    Raises ValueError if any case is not bracketed.
+    """
+    if d_guess is not None:
+        d_low, d_high, fos_low, fos_high = warm_bracket(
+            fos_func, params, target_fos, d_low, d_high, d_guess
+        )
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fos_low = np.nan_to_num(fos_func(d_low, *params), nan=0.0)
+            fos_high = fos_func(d_high, *params)
+
+    outside = (fos_high < target_fos) | (fos_low > target_fos)
+    if outside.any():
+        raise ValueError(
+            f"{np.count_nonzero(outside)} load case(s) need a diameter "
+            f"outside the solver bracket."
+        )
+
+    active = np.arange(target_fos.size)
+    d_out = np.zeros(target_fos.size)
+
+    for _ in range(max_iter):
+        d_mid = 0.5 * (d_low + d_high)
+        d_out[active] = d_mid
+
+        if instrumentation.ENABLED:
+            instrumentation.count("bisection_iterations", active.size)
+
+        fos = fos_func(d_mid, *params)
+
+        # same bracket update as the scalar bisection
+        going_down = fos > target_fos
+        d_high = np.where(going_down, d_mid, d_high)
+        d_low = np.where(going_down, d_low, d_mid)
+
+        # drop the cases that are within tolerance
+        keep = np.abs(fos - target_fos) >= tol
+        if not keep.all():
+            active = active[keep]
+            if active.size == 0:
+                break
+            params = tuple(p[keep] for p in params)
+            target_fos = target_fos[keep]
+            d_low, d_high = d_low[keep], d_high[keep]
+
+    return d_out
+
+
+def solve_for_fos(fos_func, dfos_func, target_fos, d_low, d_high,
+                    method="bisection", tol=1e-5, max_iter=100, d_guess=None):
+    """
+    Solves fos_func(d) == target_fos with the chosen method.
+    Returns (d, iterations).
+    """
+    if method not in SOLVER_METHODS:
+        raise ValueError(f"method must be one of {SOLVER_METHODS}")
+
+    check_bracket(fos_func, target_fos, d_low, d_high)
+
+    if method == "bisection":
+        return bisection(fos_func, target_fos, d_low, d_high, tol, max_iter)
+
+    if method == "brent":
+        return brent(fos_func, target_fos, d_low, d_high, max_iter)
+
+    d_start = d_guess if method == "cubic" else None
+    return newton(fos_func, dfos_func, target_fos, d_low, d_high,
+                    tol, max_iter, d_start)
@@ -0,0 +1,220 @@
+"""
+Declarative shaft layouts.
+
+A layout file (TOML or JSON) lists the segments of a shaft with their
+loads, an optional axial station and length and any number of features:
+
+- fillet:   shoulder against another segment ("link", "r_ratio")
+- keyway:   a key is designed on this segment (optional "Kt", "Kts")
+- snapRing: snap ring groove ("seat" segment, groove "Kt", "Kts")
+
+compile_layout resolves every name to an index once and builds the
+ShaftState the solvers work on, plus index arrays for the keyways and
+snap rings, so nothing downstream looks segments up by name.
+
+Loads can also come from a beam model: with a [beam] table (see
+beam_from_layout), segments that leave out V/M/T get the critical
+loads at their station from beamAnalysis.station_loads.
+
+See layouts/stage2_output_shaft.toml for the Stage 2 shaft.
+"""
+
+import json
+import os
+import tomllib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List
+import numpy as np
+
+import beamAnalysis
+import shaftState
+
+FEATURE_TYPES = ("fillet", "keyway", "snapRing")
+
+DEFAULT_R_RATIO = 0.05
+
+DEFAULT_LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "layouts", "stage2_output_shaft.toml")
+
+
+@dataclass
+class CompiledLayout:
+    name: str
+    # unsolved template; solve a copy()
+    state: shaftState.ShaftState
+    # axial position of each segment (nan where not given)
+    stations: np.ndarray
+    # axial length of each segment (nan where not given)
+    lengths: np.ndarray
+    # segment indices with a keyway
+    keyways: np.ndarray
+    # segment indices with a snap ring groove, and the seat of each
+    snap_rings: np.ndarray
+    snap_ring_seats: np.ndarray
+
+    @property
+    def names(self) -> List[str]:
+        return self.state.names
+
+    def __len__(self):
+        return len(self.state.names)
+
+    def segment_lengths(self):
+        """
+        lengths if the layout gives every segment one, else None.
+        """
+        return None if np.isnan(self.lengths).any() else self.lengths
+
+
+def read_layout(path):
+    """
+    Layout dict from a .toml or .json file.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".toml":
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if ext == ".json":
+        with open(path) as f:
+            return json.load(f)
+    raise ValueError("Layout file must end in .toml or .json")
+
+
+def beam_from_layout(beam):
+    """
+    (y_loads, z_loads, torques) from a [beam] table:
+        length, supports,
+        y = {point_loads, udls, moments}, z = {...},
+        torques = [[T, x], ...]
+    """
+    def plane(loads):
+        return beamAnalysis.BeamLoads(
+            length=beam["length"],
+            supports=list(beam["supports"]),
+            point_loads=[tuple(p) for p in loads.get("point_loads", [])],
+            udls=[tuple(u) for u in loads.get("udls", [])],
+            moments=[tuple(m) for m in loads.get("moments", [])],
+        )
+
+    return (plane(beam.get("y", {})), plane(beam.get("z", {})),
+            [tuple(t) for t in beam.get("torques", [])])
+
+
+def compile_layout(layout):
+    """
+    CompiledLayout from a layout dict. Raises ValueError on unknown or
+    duplicate names, unknown feature types, a fillet without a link or a
+    snap ring without a seat, more than one fillet on a segment, or a
+    segment without loads (and no beam to take them from).
+    """
+    segments = layout.get("segments", [])
+    if not segments:
+        raise ValueError("Layout has no segments.")
+
+    names = [seg["name"] for seg in segments]
+    index = {name: i for i, name in enumerate(names)}
+    if len(index) != len(names):
+        raise ValueError("Segment names must be unique.")
+
+    def resolve(feature, seg, field):
+        if field not in feature:
+            raise ValueError(f"{seg['name']}: {feature['type']} needs a '{field}'.")
+        name = feature[field]
+        if name not in index:
+            raise ValueError(f"{seg['name']}: {field} '{name}' is not a segment.")
+        return index[name]
+
+    n = len(segments)
+    loads = np.full((3, n), np.nan)
+    stations = np.full(n, np.nan)
+    lengths = np.full(n, np.nan)
+    link = np.full(n, -1, dtype=np.intp)
+    r_ratio = np.full(n, DEFAULT_R_RATIO)
+    Kt_min = np.ones(n)
+    Kts_min = np.ones(n)
+    keyways, snap_rings, seats = [], [], []
+
+    for i, seg in enumerate(segments):
+        for j, load in enumerate(("V", "M", "T")):
+            if load in seg:
+                loads[j, i] = seg[load]
+        if "station" in seg:
+            stations[i] = seg["station"]
+        if "length" in seg:
+            lengths[i] = seg["length"]
+
+        for feature in seg.get("features", []):
+            kind = feature.get("type")
+
+            if kind == "fillet":
+                if link[i] >= 0:
+                    raise ValueError(f"{seg['name']}: only one fillet per segment.")
+                link[i] = resolve(feature, seg, "link")
+                r_ratio[i] = feature.get("r_ratio", DEFAULT_R_RATIO)
+            elif kind == "keyway":
+                keyways.append(i)
+            elif kind == "snapRing":
+                snap_rings.append(i)
+                seats.append(resolve(feature, seg, "seat"))
+            else:
+                raise ValueError(f"{seg['name']}: feature type must be one of {FEATURE_TYPES}.")
+
+            if kind in ("keyway", "snapRing"):
+                Kt_min[i] = max(Kt_min[i], feature.get("Kt", 1.0))
+                Kts_min[i] = max(Kts_min[i], feature.get("Kts", 1.0))
+
+    missing = np.isnan(loads).any(axis=0)
+    if missing.any():
+        if "beam" not in layout:
+            raise ValueError(f"No loads for {[names[i] for i in np.flatnonzero(missing)]}"
+                                " and no [beam] to compute them from.")
+        if np.isnan(stations[missing]).any():
+            raise ValueError("Segments that take their loads from the beam need a station.")
+
+        y_loads, z_loads, torques = beam_from_layout(layout["beam"])
+        at = beamAnalysis.station_loads(
+            y_loads, z_loads, torques,
+            {names[i]: stations[i] for i in np.flatnonzero(missing)}
+        )
+        # the beam only fills in the loads a segment leaves out
+        for name, values in at.items():
+            k = index[name]
+            loads[:, k] = np.where(np.isnan(loads[:, k]), values, loads[:, k])
+
+    state = shaftState.ShaftState(
+        names=names,
+        V=loads[0],
+        M=loads[1],
+        T=loads[2],
+        link=link,
+        r_ratio=r_ratio,
+        d=np.ones(n),
+        Kt=Kt_min.copy(),
+        Kts=Kts_min.copy(),
+        fos=np.zeros(n),
+        Kt_min=Kt_min,
+        Kts_min=Kts_min,
+    )
+
+    return CompiledLayout(
+        name=layout.get("name", ""),
+        state=state,
+        stations=stations,
+        lengths=lengths,
+        keyways=np.array(keyways, dtype=np.intp),
+        snap_rings=np.array(snap_rings, dtype=np.intp),
+        snap_ring_seats=np.array(seats, dtype=np.intp),
+    )
+
+
+def load_layout(path):
+    return compile_layout(read_layout(path))
+
+
+@lru_cache(maxsize=None)
+def default_layout():
+    """
+    The Stage 2 output shaft (compiled once).
+    """
+    return load_layout(DEFAULT_LAYOUT_PATH)
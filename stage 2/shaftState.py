@@ -0,0 +1,385 @@
+"""
+Array-backed shaft state.
+
+One numpy array per segment field, with links stored as integer
+indices into the same arrays (-1 = no link). Copying a state for a
+trial is a handful of small array copies instead of a deepcopy of a
+dict of Segment objects, and the solvers work on whole arrays at once.
+"""
+
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Tuple
+import numpy as np
+
+import DiameterCalculations
+import FatigueCalculations
+import StressConcentration
+import diameterSnap
+import instrumentation
+
+# sizing criteria of the solvers: the static FoS alone, or a fatigue
+# FoS (FatigueCalculations) on top of it
+CRITERIA = ("static",) + FatigueCalculations.CRITERIA
+
+
+@dataclass
+class ShaftState:
+    names: List[str]
+    V: np.ndarray
+    M: np.ndarray
+    T: np.ndarray
+    link: np.ndarray
+    r_ratio: np.ndarray
+    d: np.ndarray
+    Kt: np.ndarray
+    Kts: np.ndarray
+    fos: np.ndarray
+    dependents: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    # lower limits on Kt/Kts from fixed-factor features (keyway, snap
+    # ring groove) on the same segment; None = no limits
+    Kt_min: Optional[np.ndarray] = None
+    Kts_min: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_segments(cls, segments):
+        segs = list(segments.values())
+        index = {name: i for i, name in enumerate(segments)}
+
+        def column(attr):
+            return np.array([getattr(seg, attr) for seg in segs], dtype=float)
+
+        return cls(
+            names=list(segments),
+            V=column("V"),
+            M=column("M"),
+            T=column("T"),
+            link=np.array([index[seg.link] if seg.link else -1 for seg in segs],
+                            dtype=np.intp),
+            r_ratio=column("r_ratio"),
+            d=column("d"),
+            Kt=column("Kt"),
+            Kts=column("Kts"),
+            fos=column("fos"),
+        )
+
+    def to_segments(self, segments):
+        """
+        Writes the solved values back onto a dict of Segment objects
+        (same order as from_segments). Returns the dict.
+        """
+        for i, seg in enumerate(segments.values()):
+            seg.r_ratio = float(self.r_ratio[i])
+            seg.d = float(self.d[i])
+            seg.Kt = float(self.Kt[i])
+            seg.Kts = float(self.Kts[i])
+            seg.fos = float(self.fos[i])
+        return segments
+
+    def copy(self):
+        # names, loads and the link graph are never modified by the solvers,
+        # so they are shared
+        shared = ("names", "V", "M", "T", "link", "dependents", "Kt_min", "Kts_min")
+        return ShaftState(**{
+            f.name: getattr(self, f.name) if f.name in shared
+            else getattr(self, f.name).copy()
+            for f in fields(self)
+        })
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def tile(self, n):
+        """
+        n independent copies of this shaft in one state (shaft k owns
+        segments k * n_seg to (k + 1) * n_seg - 1). The solvers treat
+        the result like one long shaft whose pieces never link to each
+        other, so a whole batch solves in the same array calls.
+        """
+        n_seg = len(self.names)
+        offsets = np.repeat(np.arange(n) * n_seg, n_seg)
+        link = np.tile(self.link, n)
+
+        return ShaftState(
+            names=self.names * n,
+            V=np.tile(self.V, n),
+            M=np.tile(self.M, n),
+            T=np.tile(self.T, n),
+            link=np.where(link >= 0, link + offsets, -1),
+            r_ratio=np.tile(self.r_ratio, n),
+            d=np.tile(self.d, n),
+            Kt=np.tile(self.Kt, n),
+            Kts=np.tile(self.Kts, n),
+            fos=np.tile(self.fos, n),
+            Kt_min=None if self.Kt_min is None else np.tile(self.Kt_min, n),
+            Kts_min=None if self.Kts_min is None else np.tile(self.Kts_min, n),
+        )
+
+    def link_graph(self):
+        """
+        Reverse link graph in CSR form (ptr, idx):
+        idx[ptr[j]:ptr[j + 1]] are the segments linked to segment j.
+        Built once and shared by copies.
+        """
+        if self.dependents is None:
+            n = self.link.size
+            linked = np.flatnonzero(self.link >= 0)
+            idx = linked[np.argsort(self.link[linked], kind="stable")]
+            ptr = np.zeros(n + 1, dtype=np.intp)
+            np.cumsum(np.bincount(self.link[linked], minlength=n), out=ptr[1:])
+            self.dependents = (ptr, idx)
+        return self.dependents
+
+    def affected_by(self, moved):
+        """
+        Segments whose Kt/Kts depend on any diameter in moved: the
+        moved segments that have a link, plus everything linked to them.
+        """
+        ptr, idx = self.link_graph()
+        parts = [moved[self.link[moved] >= 0]]
+        parts += [idx[ptr[j]:ptr[j + 1]] for j in moved]
+        return np.unique(np.concatenate(parts))
+
+
+def update_stress_concentration(state, linked=None):
+    """
+    Kt/Kts for linked segments from their own and their partner's
+    diameter, with r = r_ratio * smaller diameter, raised to Kt_min /
+    Kts_min where set. linked defaults to every segment that has a link.
+    """
+    if linked is None:
+        linked = np.flatnonzero(state.link >= 0)
+    if linked.size == 0:
+        return
+
+    d_self = state.d[linked]
+    d_link = state.d[state.link[linked]]
+
+    D = np.maximum(d_self, d_link)
+    d_small = np.minimum(d_self, d_link)
+    r = state.r_ratio[linked] * d_small
+
+    Kt = StressConcentration.stress_concentration(D, d_small, r, "bending")
+    Kts = StressConcentration.stress_concentration(D, d_small, r, "torsion")
+
+    if state.Kt_min is not None:
+        Kt = np.maximum(Kt, state.Kt_min[linked])
+        Kts = np.maximum(Kts, state.Kts_min[linked])
+
+    state.Kt[linked] = Kt
+    state.Kts[linked] = Kts
+
+
+def section_r_ratio(state):
+    """
+    Fillet radius over each segment's own diameter, the r_ratio that
+    FatigueCalculations takes. The radius is r_ratio times the smaller
+    diameter of the shoulder, as in update_stress_concentration.
+    """
+    d_small = state.d.copy()
+    linked = np.flatnonzero(state.link >= 0)
+    d_small[linked] = np.minimum(state.d[linked], state.d[state.link[linked]])
+    return state.r_ratio * d_small / state.d
+
+
+def fatigue_fos(state, Sut, Sy, criterion="goodman", surface="machined", reliability=0.50):
+    """
+    Fatigue FoS of every segment at its current diameter, with M fully
+    reversed and T steady (FatigueCalculations.split_loads).
+    """
+    M_a, M_m, T_a, T_m = FatigueCalculations.split_loads(state.M, state.T)
+
+    return FatigueCalculations.fos_calculation(
+        M_a, M_m, T_a, T_m, Sut, Sy, state.Kt, state.Kts, section_r_ratio(state),
+        state.d, criterion, surface, reliability
+    )
+
+
+@dataclass
+class IterativeDiagnostics:
+    passes: int = 0
+    # False if max_iter passes ran without the diameters settling
+    converged: bool = False
+
+
+def solve_iterative(state, Sy, target_fos, tol=1e-7, max_iter=50, d_guess=None,
+                    full_output=False, criterion="static", Sut=None):
+    """
+    Fixed-point solve of diameters and stress concentrations, in place.
+    Sy, target_fos and Sut can be scalars or one value per segment.
+
+    criterion "goodman" or "asme_elliptic" also sizes every segment for
+    that fatigue FoS (Sut needed; segments with Sut nan are left to the
+    static FoS) and keeps the larger of the static and fatigue
+    diameters. The notch radius of the fatigue solve comes from the
+    diameters of the previous pass, so it settles with Kt/Kts.
+
+    Keeps a worklist of dirty segments: after the first pass, only
+    segments whose Kt/Kts changed are re-solved, and only segments next
+    to a diameter that moved get their Kt/Kts recomputed. A segment
+    whose inputs did not change keeps its diameter.
+
+    Passes after the first warm-start each bisection from the diameter
+    of the previous pass; d_guess (one per segment) does the same for
+    the first pass. The warm bracket ends the bisection at a different
+    point than a cold start, so the diameters agree with re-solving
+    every segment from scratch only to within the bisection's FoS
+    tolerance.
+
+    With full_output=True returns (state, IterativeDiagnostics); the
+    converged flag is False (and the fixed_point_unconverged counter
+    goes up) when max_iter passes did not settle the diameters.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of {CRITERIA}")
+    fatigue = criterion != "static"
+    if fatigue and Sut is None:
+        raise ValueError(f"criterion '{criterion}' needs Sut")
+
+    # Sy, target_fos and Sut may be per-segment arrays (batched shafts)
+    Sy = np.broadcast_to(np.asarray(Sy, dtype=float), state.d.shape)
+    target_fos = np.broadcast_to(np.asarray(target_fos, dtype=float), state.d.shape)
+    if fatigue:
+        Sut = np.broadcast_to(np.asarray(Sut, dtype=float), state.d.shape)
+        M_a, M_m, T_a, T_m = FatigueCalculations.split_loads(state.M, state.T)
+
+    dirty = np.arange(len(state.names))
+    first_pass = True
+    passes = 0
+    converged = False
+
+    for passes in range(1, max_iter + 1):
+
+        instrumentation.count("fixed_point_passes")
+
+        if first_pass:
+            guess = None if d_guess is None else np.asarray(d_guess, dtype=float)
+        else:
+            guess = state.d[dirty]
+
+        d_new = DiameterCalculations.solve_required_diameter_batch(
+            state.V[dirty], state.M[dirty], state.T[dirty],
+            Sy[dirty], state.Kt[dirty], state.Kts[dirty],
+            target_fos[dirty], d_guess=guess
+        )
+
+        if fatigue:
+            sized = np.isfinite(Sut[dirty])
+            j = dirty[sized]
+            d_fatigue = FatigueCalculations.solve_required_diameter_batch(
+                M_a[j], M_m[j], T_a[j], T_m[j], Sut[j], Sy[j], state.Kt[j], state.Kts[j],
+                section_r_ratio(state)[j], target_fos[j], criterion,
+                d_guess=None if guess is None else guess[sized]
+            )
+            d_new[sized] = np.maximum(d_new[sized], d_fatigue)
+
+        change = np.abs(d_new - state.d[dirty])
+        state.d[dirty] = d_new
+
+        if first_pass:
+            affected = np.flatnonzero(state.link >= 0)
+            first_pass = False
+        else:
+            affected = state.affected_by(dirty[change > 0])
+
+        Kt_old = state.Kt[affected]
+        Kts_old = state.Kts[affected]
+        update_stress_concentration(state, affected)
+
+        if change.max() < tol:
+            converged = True
+            break
+
+        dirty = affected[(state.Kt[affected] != Kt_old)
+                            | (state.Kts[affected] != Kts_old)]
+        if dirty.size == 0:
+            converged = True
+            break
+
+    if not converged:
+        instrumentation.count("fixed_point_unconverged")
+
+    if full_output:
+        return state, IterativeDiagnostics(passes, converged)
+    return state
+
+def snap_diameters(state, type="norm"):
+    """
+    Snaps every diameter up to the standard sizes.
+    Returns the number of diameters that moved.
+    """
+    d_old = state.d
+    state.d = diameterSnap.snap_diameters(d_old, type)
+
+    moved = int(np.count_nonzero(np.abs(state.d - d_old) > 1e-9))
+    instrumentation.count("snap_events", moved)
+    return moved
+
+
+@dataclass
+class DiscreteDiagnostics:
+    converged: bool = False
+    outer_passes: int = 0
+    # fixed-point passes over all outer passes
+    inner_passes: int = 0
+    # False if any continuous solve stopped at max_iter unsettled
+    inner_converged: bool = True
+    # > 0 if the snapped diameters came back to an earlier set
+    cycle_length: int = 0
+    # diameters moved by the snap, per outer pass
+    snap_moves: List[int] = field(default_factory=list)
+
+
+def solve_discrete(state, Sy, target_fos, tol=1e-7, max_outer_iter=20, max_iter=50,
+                    full_output=False, criterion="static", Sut=None):
+    """
+    Continuous solve followed by a snap to the standard sizes, repeated
+    until the snapped diameters are the same as on the previous outer
+    pass. max_outer_iter limits the outer passes, max_iter the
+    fixed-point passes of each continuous solve. criterion and Sut are
+    passed on to solve_iterative.
+
+    Each outer pass warm-starts its bisections from the continuous
+    diameters of the pass before, which the new ones lie close to. If
+    the snapped set comes back to one from an earlier pass (a snap
+    cycle) the loop stops and keeps the largest diameter of the cycle
+    for each segment.
+
+    With full_output=True returns (state, DiscreteDiagnostics).
+    """
+    diagnostics = DiscreteDiagnostics()
+    history = []
+    d_guess = None
+
+    with instrumentation.stage("solve_discrete"):
+        for _ in range(max_outer_iter):
+
+            diagnostics.outer_passes += 1
+
+            _, inner = solve_iterative(state, Sy, target_fos, tol, max_iter,
+                                        d_guess, full_output=True,
+                                        criterion=criterion, Sut=Sut)
+            diagnostics.inner_passes += inner.passes
+            diagnostics.inner_converged &= inner.converged
+            d_guess = state.d.copy()
+
+            diagnostics.snap_moves.append(snap_diameters(state, "norm"))
+
+            # how many passes back the same snapped set was seen
+            back = next((k for k, d_old in enumerate(reversed(history), 1)
+                            if np.array_equal(d_old, state.d)), 0)
+
+            if back == 1:
+                diagnostics.converged = True
+                break
+
+            if back > 1:
+                instrumentation.count("snap_cycles")
+                diagnostics.cycle_length = back
+                state.d = np.max(history[-back:], axis=0)
+                break
+
+            history.append(state.d.copy())
+
+    if full_output:
+        return state, diagnostics
+    return state
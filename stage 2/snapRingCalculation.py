@@ -12,12 +12,17 @@ from dataclasses import dataclass
 from typing import Dict, Any, List
 import numpy as np
 import diameterSnap
+import rootSolvers
+import instrumentation
 
 
 
 
 
 def von_mises_stress(d_out, d_in, V, M, T, Kt, Kts):
+    if instrumentation.ENABLED:
+        instrumentation.count("snap_ring.von_mises_stress", np.size(d_out))
+
     pi = np.pi
 
     J = (pi / 32) * (d_out**4 - d_in**4)
@@ -37,32 +42,77 @@ def von_mises_stress(d_out, d_in, V, M, T, Kt, Kts):
 
 
 def fos_calculation(V, M ,T, Sy, Kt, Kts ,d_out , d_in):
+        if instrumentation.ENABLED:
+            instrumentation.count("snap_ring.fos_calculation", np.size(d_out))
         sigma_vm = von_mises_stress(d_out, d_in, V, M, T, Kt, Kts)
         return Sy / sigma_vm 
 
 
-def solve_required_diameter(V, M, T, Sy, Kt, Kts, target_fos , d_inner):
+def von_mises_stress_derivative(d_out, d_in, V, M, T, Kt, Kts):
+    """
+    d(sigma_vm)/d(d_out) for the annular section, d_in held fixed.
+    """
+    pi = np.pi
+
+    Q = d_out**4 - d_in**4
+
+    sigma_b = Kt * 32 * M * d_out / (pi * Q)
+    tau_t = Kts * 16 * T * d_out / (pi * Q)
+    tau_v = 16 * V / (3 * pi * (d_out**2 - d_in**2))
+
+    tau_combined = tau_t + tau_v
+    sigma_vm = np.sqrt(sigma_b**2 + 3 * tau_combined**2)
+
+    # bending and torsion go as d_out / Q, direct shear as 1 / (d_out^2 - d_in^2)
+    shape = 1 / d_out - 4 * d_out**3 / Q
+    dsigma_b = sigma_b * shape
+    dtau_combined = tau_t * shape - tau_v * 2 * d_out / (d_out**2 - d_in**2)
+
+    return (sigma_b * dsigma_b + 3 * tau_combined * dtau_combined) / sigma_vm
 
-    # diamater will prolly be between these bounds
-    d_low = d_inner
-    d_high = 5.0
-    d_mid = 0
 
-    for _ in range(100):
-        d_mid = 0.5 * (d_low + d_high)
-        fos = fos_calculation(V, M, T, Sy,  Kt, Kts, d_mid , d_inner)
+def fos_derivative(V, M, T, Sy, Kt, Kts, d_out, d_in):
+    sigma_vm = von_mises_stress(d_out, d_in, V, M, T, Kt, Kts)
+    dsigma_vm = von_mises_stress_derivative(d_out, d_in, V, M, T, Kt, Kts)
+    return -Sy * dsigma_vm / sigma_vm**2
 
-        # Runs until fos is withing a certain tolerance or 100 iterations
-        if abs(fos - target_fos) < 1e-5:
-            break
 
-        # binary search for the fos
-        if  fos > target_fos:
-            d_high = d_mid
-        else:
-            d_low = d_mid
+def cubic_diameter_guess(V, M, T, Sy, Kt, Kts, target_fos, d_inner):
+    """
+    Closed-form estimate of the outer diameter. Without direct shear a
+    solid shaft needs d_s^3 = 16 n sqrt(4 (Kt M)^2 + 3 (Kts T)^2) / (pi Sy),
+    and the annulus needs d_out^4 - d_in^4 = d_s^3 d_out.
+    """
+    moment = np.sqrt(4 * (Kt * M)**2 + 3 * (Kts * T)**2)
+    d_solid = np.cbrt(16 * target_fos * moment / (np.pi * Sy))
+    return (d_inner**4 + d_solid**3 * max(d_solid, d_inner))**0.25
+
+
+def solve_required_diameter(V, M, T, Sy, Kt, Kts, target_fos , d_inner,
+                            method="bisection", d_max=5.0, full_output=False):
+    """
+    Outer diameter where the FoS hits target_fos, searched on
+    [d_inner, d_max]. method is one of rootSolvers.SOLVER_METHODS.
+    Raises ValueError if the answer is above d_max. With
+    full_output=True returns (d, iterations).
+    """
+
+    d_guess = None
+    if method == "cubic":
+        d_guess = cubic_diameter_guess(V, M, T, Sy, Kt, Kts, target_fos, d_inner)
+
+    d, iterations = rootSolvers.solve_for_fos(
+        lambda d: fos_calculation(V, M, T, Sy, Kt, Kts, d, d_inner),
+        lambda d: fos_derivative(V, M, T, Sy, Kt, Kts, d, d_inner),
+        target_fos,
+        d_inner, d_max,
+        method=method,
+        d_guess=d_guess
+    )
 
-    return d_mid
+    if full_output:
+        return d, iterations
+    return d
 
 def solve_discrete_snap_ring(
     V,
@@ -74,7 +124,8 @@ def solve_discrete_snap_ring(
     target_fos,
     inner_diameter,
     tol=1e-7,
-    max_iter=50
+    max_iter=50,
+    method="bisection"
 ):
     """
     Solves required snap ring outer diameter,
@@ -87,11 +138,14 @@ def solve_discrete_snap_ring(
         V, M, T,
         Sy, Kt, Kts,
         target_fos,
-        inner_diameter
+        inner_diameter,
+        method=method
     )
 
     # --- 2) Snap to catalog OD ---
-    d_snapped = diameterSnap.snap_diameter(d_required, "snapRing")
+    sizes = diameterSnap.catalog("snapRing")
+    i = diameterSnap.snap_index(d_required, "snapRing")
+    d_snapped = float(sizes[i])
 
     # --- 3) Recalculate FoS ---
     fos = fos_calculation(
@@ -104,9 +158,9 @@ def solve_discrete_snap_ring(
     # --- 4) If FoS too low, step up catalog sizes ---
     while fos < target_fos:
 
-        # bump slightly to force next catalog size
-        d_snapped += 1e-6
-        d_snapped = diameterSnap.snap_diameter(d_snapped, "snapRing")
+        i = diameterSnap.next_size_index(i, "snapRing")
+        instrumentation.count("snap_ring_step_ups")
+        d_snapped = float(sizes[i])
 
         fos = fos_calculation(
             V, M, T,
@@ -118,3 +172,56 @@ def solve_discrete_snap_ring(
     return d_snapped, fos
 
 
+def solve_required_diameter_batch(V, M, T, Sy, Kt, Kts, target_fos, d_inner,
+                                    d_max=5.0):
+    """
+    Vectorized solve_required_diameter (bisection) over arrays of cases.
+    """
+    V, M, T, Sy, Kt, Kts, target_fos, d_inner = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float)
+            for x in (V, M, T, Sy, Kt, Kts, target_fos, d_inner))
+    )
+    shape = V.shape
+
+    d = rootSolvers.bisection_batch(
+        lambda d, V, M, T, Sy, Kt, Kts, d_in:
+            fos_calculation(V, M, T, Sy, Kt, Kts, d, d_in),
+        tuple(x.ravel() for x in (V, M, T, Sy, Kt, Kts, d_inner)),
+        target_fos.ravel(),
+        d_inner.ravel().copy(),
+        np.full(V.size, float(d_max))
+    )
+
+    return d.reshape(shape)
+
+
+def solve_discrete_snap_ring_batch(V, M, T, Sy, Kt, Kts, target_fos, inner_diameter):
+    """
+    Vectorized solve_discrete_snap_ring. Returns (d_snapped, fos) arrays.
+    """
+    V, M, T, Sy, Kt, Kts, target_fos, inner_diameter = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float)
+            for x in (V, M, T, Sy, Kt, Kts, target_fos, inner_diameter))
+    )
+
+    d_required = solve_required_diameter_batch(
+        V, M, T, Sy, Kt, Kts, target_fos, inner_diameter
+    )
+
+    sizes = diameterSnap.catalog("snapRing")
+    idx = np.searchsorted(sizes, d_required, side="left")
+
+    # step every case that misses the target up one size at a time
+    while True:
+        if np.any(idx >= len(sizes)):
+            raise ValueError("Required diameter exceeds available standard sizes.")
+
+        d_snapped = sizes[idx]
+        fos = fos_calculation(V, M, T, Sy, Kt, Kts, d_snapped, inner_diameter)
+
+        low = fos < target_fos
+        if not low.any():
+            return d_snapped, fos
+
+        instrumentation.count("snap_ring_step_ups", np.count_nonzero(low))
+        idx = idx + low